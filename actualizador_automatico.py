@@ -1,13 +1,32 @@
 import mysql.connector
+import numpy as np
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
 import schedule
 import time
 import hashlib
 import logging
+import configparser
+import json
+import gzip
+import shutil
+import threading
+import random
+import multiprocessing
+from email.utils import parsedate_to_datetime
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from datetime import datetime, timedelta
+
+try:
+    import polars as pl  # Motor de limpieza opcional ([Cleaning] backend = polars)
+except ImportError:
+    pl = None
 import os
+import re
 import sys
+import argparse
 
 # Configurar logging
 logging.basicConfig(
@@ -19,255 +38,2129 @@ logging.basicConfig(
     ]
 )
 
-class ActualizadorMorbilidad:
+RUTA_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.ini')
+URL_API_DEFECTO = "https://www.datos.gov.co/resource/w6k7-5tme.json"
+
+# Columnas del recurso que se cargan en la base de datos
+COLUMNAS_API = [
+    'periodo', 'a_o', 'sexo', 'edad', 'tipo_edad', 'procedencia', 'departamento',
+    'fecha_atencion', 'diagnostico', 'nombre_diagnostico', 'regimen', 'eapb'
+]
+
+# Reglas de validación por defecto (si config.ini no tiene la sección [Validation]):
+# limpiar_datos las aplica en pandas y la API las recibe como $where
+REGLAS_VALIDACION = [
+    {'tipo': 'rango', 'campo': 'edad', 'minimo': 0, 'maximo': 120},
+    {'tipo': 'valores', 'campo': 'sexo', 'valores': ['M', 'F']},
+    {'tipo': 'fecha', 'campo': 'fecha_atencion'},
+    {'tipo': 'rango', 'campo': 'a_o', 'minimo': 2020, 'maximo': 2025},
+    {'tipo': 'no_vacio', 'campo': 'periodo'},
+    {'tipo': 'no_vacio', 'campo': 'tipo_edad'},
+    {'tipo': 'no_vacio', 'campo': 'procedencia'},
+    {'tipo': 'no_vacio', 'campo': 'departamento'},
+    {'tipo': 'no_vacio', 'campo': 'diagnostico'},
+    {'tipo': 'no_vacio', 'campo': 'nombre_diagnostico'},
+    {'tipo': 'no_vacio', 'campo': 'regimen'},
+    {'tipo': 'no_vacio', 'campo': 'eapb'},
+]
+
+# Campos que identifican un registro para detectar duplicados (huella hash_registro)
+COLUMNAS_HUELLA = [
+    'periodo', 'a_o', 'sexo', 'edad', 'procedencia', 'departamento',
+    'fecha_atencion', 'diagnostico', 'regimen', 'eapb'
+]
+
+# Versión 2: huella vectorizada de 128 bits (dos hash_array de 64 bits con claves distintas),
+# guardada como 32 caracteres hex. Versión 3: la misma huella como BINARY(16).
+# Versión 4: hashes_registros guarda además el periodo del registro (índice particionado).
+# La versión 1 era md5 fila por fila y no es comparable; ver migrar_hashes_registros.
+VERSION_HASH = 4
+# hash_array exige claves de exactamente 16 caracteres
+CLAVES_HUELLA = ('huella-morbil-01', 'huella-morbil-02')
+
+def texto_huella(df):
+    """
+    Concatenar columna a columna los campos de la huella en su forma canónica
+    (enteros sin decimales, fecha con segundos, nulos como texto vacío)
+    """
+    partes = []
+    for campo in COLUMNAS_HUELLA:
+        serie = df[campo]
+        if campo in ('a_o', 'edad'):
+            serie = serie.astype('int64').astype(str)
+        elif campo == 'fecha_atencion':
+            serie = pd.to_datetime(serie).dt.strftime('%Y-%m-%d %H:%M:%S')
+        else:
+            serie = serie.astype(object).where(serie.notna(), '').astype(str)
+        partes.append(serie.reset_index(drop=True))
+    
+    return partes[0].str.cat(partes[1:], sep='|')
+
+def calcular_huellas(df):
+    """
+    Calcular la huella de 128 bits de todas las filas a la vez, como dos arreglos uint64 (alto, bajo)
+    """
+    if len(df) == 0:
+        return np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.uint64)
+    
+    return huellas_desde_textos(texto_huella(df).to_numpy(dtype=object))
+
+def huellas_desde_textos(valores):
+    """
+    Huella (alto, bajo) de cada texto canónico (arreglo de objetos str)
+    """
+    alto, bajo = (pd.util.hash_array(valores, hash_key=clave) for clave in CLAVES_HUELLA)
+    return alto, bajo
+
+def huellas_a_binario(alto, bajo):
+    """
+    Huellas como valores de 16 bytes (alto y bajo en big-endian) para la columna BINARY(16)
+    """
+    digestos = np.empty((len(alto), 2), dtype='>u8')
+    digestos[:, 0] = alto
+    digestos[:, 1] = bajo
+    contenido = digestos.tobytes()
+    return [contenido[inicio:inicio + 16] for inicio in range(0, len(contenido), 16)]
+
+def binario_a_huellas(valores):
+    """
+    Convertir valores BINARY(16) leídos de la base de datos a arreglos (alto, bajo)
+    """
+    digestos = np.frombuffer(b''.join(valores), dtype='>u8').reshape(-1, 2)
+    return digestos[:, 0].astype(np.uint64), digestos[:, 1].astype(np.uint64)
+
+class IndiceHuellas:
+    """
+    Índice en memoria de las huellas ya cargadas: dos arreglos uint64 paralelos ordenados
+    por el entero alto, 16 bytes por registro. La pertenencia se resuelve con searchsorted.
+    """
+    def __init__(self, alto=None, bajo=None):
+        self.alto = np.empty(0, dtype=np.uint64)
+        self.bajo = np.empty(0, dtype=np.uint64)
+        if alto is not None:
+            self.agregar(alto, bajo)
+    
+    def __len__(self):
+        return len(self.alto)
+    
+    def agregar(self, alto, bajo):
+        # Ordenar solo las huellas nuevas e intercalarlas en su posición
+        orden = np.argsort(np.asarray(alto, dtype=np.uint64), kind='stable')
+        alto = np.asarray(alto, dtype=np.uint64)[orden]
+        bajo = np.asarray(bajo, dtype=np.uint64)[orden]
+        posiciones = np.searchsorted(self.alto, alto)
+        self.alto = np.insert(self.alto, posiciones, alto)
+        self.bajo = np.insert(self.bajo, posiciones, bajo)
+    
+    def contiene(self, alto, bajo):
+        """
+        Arreglo booleano: True para cada huella (alto, bajo) que ya está en el índice
+        """
+        alto = np.asarray(alto, dtype=np.uint64)
+        bajo = np.asarray(bajo, dtype=np.uint64)
+        if len(self.alto) == 0:
+            return np.zeros(len(alto), dtype=bool)
+        
+        posiciones = np.searchsorted(self.alto, alto)
+        acotadas = np.minimum(posiciones, len(self.alto) - 1)
+        mismo_alto = (posiciones < len(self.alto)) & (self.alto[acotadas] == alto)
+        encontrados = mismo_alto & (self.bajo[acotadas] == bajo)
+        
+        # Varias huellas con el mismo entero alto (muy raro): revisar el tramo completo
+        for posicion in np.flatnonzero(mismo_alto & ~encontrados):
+            fin = np.searchsorted(self.alto, alto[posicion], side='right')
+            encontrados[posicion] = (self.bajo[posiciones[posicion]:fin] == bajo[posicion]).any()
+        
+        return encontrados
+
+def clave_periodo(df):
+    """
+    Periodo de cada fila como partición del índice de huellas (texto vacío si falta)
+    """
+    return df['periodo'].astype(object).where(df['periodo'].notna(), '').to_numpy(dtype=object)
+
+class IndicePorPeriodo:
+    """
+    Índice de huellas particionado por periodo. Como el periodo forma parte de la huella,
+    un registro solo puede repetir huellas de su mismo periodo: cada lote carga y consulta
+    únicamente las particiones de los periodos que trae.
+    """
+    def __init__(self, cargar):
+        self.cargar = cargar  # función: lista de periodos -> {periodo: IndiceHuellas}
+        self.particiones = {}
+    
+    def __len__(self):
+        return sum(len(indice) for indice in self.particiones.values())
+    
+    def preparar(self, periodos):
+        faltantes = [periodo for periodo in periodos if periodo not in self.particiones]
+        if faltantes:
+            self.particiones.update(self.cargar(faltantes))
+    
+    def grupos(self, periodos):
+        periodos = np.asarray(periodos, dtype=object)
+        codigos, unicos = pd.factorize(periodos)
+        self.preparar(list(unicos))
+        for codigo, periodo in enumerate(unicos):
+            yield periodo, codigos == codigo
+    
+    def contiene(self, periodos, alto, bajo):
+        alto = np.asarray(alto, dtype=np.uint64)
+        bajo = np.asarray(bajo, dtype=np.uint64)
+        resultado = np.zeros(len(alto), dtype=bool)
+        for periodo, filas in self.grupos(periodos):
+            resultado[filas] = self.particiones[periodo].contiene(alto[filas], bajo[filas])
+        return resultado
+    
+    def agregar(self, periodos, alto, bajo):
+        alto = np.asarray(alto, dtype=np.uint64)
+        bajo = np.asarray(bajo, dtype=np.uint64)
+        for periodo, filas in self.grupos(periodos):
+            self.particiones[periodo].agregar(alto[filas], bajo[filas])
+
+class FiltroBloom:
+    """
+    Filtro de Bloom en disco (memmap) sobre las huellas de hashes_registros.
+    Responde "quizás vista" o "seguro nueva"; solo las primeras necesitan verificarse
+    en la base de datos. La cabecera guarda hasta qué id de hashes_registros se leyó, así el
+    filtro se pone al día leyendo solo los ids posteriores. Los ids saltados en esa lectura
+    (transacciones aún sin confirmar, rollbacks, INSERT IGNORE ignorados) se guardan aparte
+    en <ruta>.huecos con la hora en que se detectaron, para buscarlos de nuevo uno a uno.
+    """
+    MAGICO = b'BLOOMMH1'
+    CABECERA = 64
+    
+    def __init__(self, ruta, capacidad, tasa_falsos_positivos):
+        self.ruta = ruta
+        self.capacidad = capacidad
+        self.bits = max(64, int(-capacidad * np.log(tasa_falsos_positivos) / np.log(2) ** 2))
+        self.funciones = max(1, round(self.bits / capacidad * np.log(2)))
+        self.ruta_huecos = ruta + '.huecos'
+        self.huecos = {}
+        self.abrir()
+    
+    def abrir(self, reiniciar=False):
+        """
+        Mapear el archivo existente, o crear uno vacío si falta o cambió su dimensionamiento
+        """
+        tamano = self.CABECERA + (self.bits + 7) // 8
+        if not reiniciar and os.path.exists(self.ruta) and os.path.getsize(self.ruta) == tamano:
+            with open(self.ruta, 'rb') as archivo:
+                cabecera = archivo.read(self.CABECERA)
+            bits, funciones = np.frombuffer(cabecera, dtype='<u8', count=2, offset=8)
+            if cabecera[:8] == self.MAGICO and (bits, funciones) == (self.bits, self.funciones):
+                self.mapa = np.memmap(self.ruta, dtype=np.uint8, mode='r+')
+                self.huecos = {}
+                if os.path.exists(self.ruta_huecos):
+                    with open(self.ruta_huecos, encoding='utf-8') as archivo:
+                        self.huecos = {int(id_hueco): detectado for id_hueco, detectado in json.load(archivo).items()}
+                return
+            
+        logging.info(f"[INFO] Creando filtro de Bloom {self.ruta} ({tamano / 1048576:.1f} MB, {self.funciones} funciones)")
+        temporal = self.ruta + '.tmp'
+        with open(temporal, 'wb') as archivo:
+            archivo.write(self.MAGICO + np.array([self.bits, self.funciones, 0, 0], dtype='<u8').tobytes())
+            archivo.truncate(tamano)
+        os.replace(temporal, self.ruta)
+        self.mapa = np.memmap(self.ruta, dtype=np.uint8, mode='r+')
+        self.guardar_huecos({})
+    
+    def guardar_huecos(self, huecos):
+        """
+        Escribir de forma atómica los ids pendientes {id: hora de detección}
+        """
+        temporal = self.ruta_huecos + '.tmp'
+        with open(temporal, 'w', encoding='utf-8') as archivo:
+            json.dump({str(id_hueco): detectado for id_hueco, detectado in huecos.items()}, archivo)
+        os.replace(temporal, self.ruta_huecos)
+        self.huecos = dict(huecos)
+    
+    @property
+    def id_maximo(self):
+        return int(self.mapa[24:32].view('<u8')[0])
+    
+    @property
+    def elementos(self):
+        return int(self.mapa[32:40].view('<u8')[0])
+    
+    def posiciones(self, alto, bajo):
+        """
+        Bits de cada huella por doble hashing: (alto + i * bajo) mod bits
+        """
+        alto = np.asarray(alto, dtype=np.uint64)
+        bajo = np.asarray(bajo, dtype=np.uint64)
+        with np.errstate(over='ignore'):
+            return [(alto + np.uint64(i) * bajo) % np.uint64(self.bits) for i in range(self.funciones)]
+    
+    def contiene(self, alto, bajo):
+        """
+        Arreglo booleano: True si la huella quizás ya fue vista, False si seguro es nueva
+        """
+        arreglo = self.mapa[self.CABECERA:]
+        resultado = np.ones(len(alto), dtype=bool)
+        for posicion in self.posiciones(alto, bajo):
+            resultado &= (arreglo[posicion >> np.uint64(3)] >> (posicion & np.uint64(7)).astype(np.uint8)) & 1 == 1
+        return resultado
+    
+    def agregar(self, alto, bajo, id_maximo, huecos=None):
+        """
+        Marcar las huellas y registrar hasta qué id de hashes_registros se leyó y, si se
+        reciben, los ids pendientes. Los bits y los huecos se escriben antes que la cabecera:
+        si el proceso se interrumpe, la siguiente puesta al día vuelve a leer esos ids.
+        """
+        arreglo = self.mapa[self.CABECERA:]
+        for posicion in self.posiciones(alto, bajo):
+            np.bitwise_or.at(arreglo, posicion >> np.uint64(3), np.left_shift(1, posicion & np.uint64(7)).astype(np.uint8))
+        self.mapa.flush()
+        
+        if huecos is not None:
+            self.guardar_huecos(huecos)
+        self.mapa[24:40].view('<u8')[:] = [id_maximo, self.elementos + len(alto)]
+        self.mapa.flush()
+        
+        if self.elementos > self.capacidad:
+            logging.warning(f"⚠️  El filtro de Bloom supera su capacidad ({self.elementos} > {self.capacidad}); "
+                            f"aumente bloom_capacity para conservar la tasa de falsos positivos")
+
+def regla_a_soql(regla, campo=None):
+    """
+    Traducir una regla de validación a una condición SoQL (campo = nombre en el recurso)
+    """
+    campo = campo or regla['campo']
+    
+    if regla['tipo'] == 'rango':
+        return f"{campo} between {regla['minimo']} and {regla['maximo']}"
+    if regla['tipo'] == 'valores':
+        valores = ', '.join("'{}'".format(str(valor).replace("'", "''")) for valor in regla['valores'])
+        return f"{campo} in ({valores})"
+    # 'fecha' y 'no_vacio': en Socrata los textos vacíos se guardan como nulos
+    return f"{campo} IS NOT NULL"
+
+def mascara_regla(df, regla):
+    """
+    Evaluar una regla de validación sobre un DataFrame ya convertido
+    """
+    serie = df[regla['campo']]
+    
+    if regla['tipo'] == 'rango':
+        return (serie >= regla['minimo']) & (serie <= regla['maximo'])
+    if regla['tipo'] == 'valores':
+        return serie.isin(regla['valores'])
+    if regla['tipo'] == 'fecha':
+        return serie.notna()
+    return serie.notna() & (serie.str.len() > 0)
+
+def leer_regla(campo, texto):
+    """
+    Interpretar una regla de [Validation]: "rango <mínimo> <máximo>", "valores <v1>,<v2>",
+    "fecha" o "no_vacio"
+    """
+    partes = texto.split(None, 1)
+    tipo = partes[0]
+    parametros = partes[1] if len(partes) > 1 else ''
+    
+    if tipo == 'rango':
+        minimo, maximo = (float(valor) for valor in parametros.split())
+        return {'tipo': tipo, 'campo': campo,
+                'minimo': int(minimo) if minimo.is_integer() else minimo,
+                'maximo': int(maximo) if maximo.is_integer() else maximo}
+    if tipo == 'valores':
+        return {'tipo': tipo, 'campo': campo, 'valores': [valor.strip() for valor in parametros.split(',') if valor.strip()]}
+    if tipo in ('fecha', 'no_vacio'):
+        return {'tipo': tipo, 'campo': campo}
+    
+    raise ValueError(f"Regla de validación desconocida para {campo}: {texto}")
+
+def cargar_reglas_validacion(config):
+    """
+    Reglas de la sección [Validation] (campo = regla; varias reglas del mismo campo
+    separadas por ';'), o REGLAS_VALIDACION si la sección no existe
+    """
+    if not config.has_section('Validation'):
+        return REGLAS_VALIDACION
+    
+    reglas = []
+    for campo in config.options('Validation'):
+        for texto in config.get('Validation', campo).split(';'):
+            if texto.strip():
+                reglas.append(leer_regla(campo, texto.strip()))
+    return reglas
+
+def cargar_configuracion(ruta=RUTA_CONFIG):
+    """
+    Cargar config.ini (si existe) con los parámetros del actualizador
+    """
+    config = configparser.ConfigParser()
+    if os.path.exists(ruta):
+        config.read(ruta, encoding='latin-1')
+    return config
+
+def leer_fuente(config, nombre, seccion=None):
+    """
+    Leer la definición de una fuente de datos; lo que la sección no defina
+    se toma de [API], [Incremental] y [Schedule]
+    """
+    def opcion(metodo, clave, seccion_general, defecto):
+        if seccion and config.has_option(seccion, clave):
+            return metodo(seccion, clave)
+        return metodo(seccion_general, clave, fallback=defecto)
+    
+    # column_map = campo_en_recurso:campo_canonico, ...
+    mapeo_columnas = {}
+    for par in (config.get(seccion, 'column_map', fallback='') if seccion else '').split(','):
+        if ':' in par:
+            origen, destino = par.split(':', 1)
+            mapeo_columnas[origen.strip()] = destino.strip()
+    
+    return {
+        'nombre': nombre,
+        'url': opcion(config.get, 'url', 'API', URL_API_DEFECTO),
+        'mapeo_columnas': mapeo_columnas,
+        'campo_marca_agua': opcion(config.get, 'watermark_field', 'Incremental', 'fecha_atencion'),
+        'intervalo_horas': opcion(config.getfloat, 'update_interval_hours', 'Schedule', 24),
+        'max_peticiones': opcion(config.getint, 'max_concurrent_requests', 'API', 4),
+        'peticiones_por_segundo': opcion(config.getfloat, 'requests_per_second', 'API', 4),
+        'principal': seccion is None
+    }
+
+def cargar_fuentes(config):
+    """
+    Registro de fuentes: el recurso de [API] más una sección [Source:<nombre>] por recurso adicional
+    """
+    url_principal = config.get('API', 'url', fallback=URL_API_DEFECTO)
+    fuentes = [leer_fuente(config, os.path.basename(url_principal).rsplit('.', 1)[0])]
+    
+    for seccion in config.sections():
+        if seccion.startswith('Source:'):
+            fuentes.append(leer_fuente(config, seccion.split(':', 1)[1].strip(), seccion))
+    
+    return fuentes
+
+# Errores de red que se reintentan; un cuerpo truncado (IncompleteRead) llega como
+# ChunkedEncodingError, que no hereda de ConnectionError ni de Timeout
+ERRORES_RED = (
+    requests.ConnectionError, requests.Timeout,
+    requests.exceptions.ChunkedEncodingError, requests.exceptions.ContentDecodingError
+)
+
+class LimitadorTasa:
+    """
+    Limitar las peticiones por segundo a la API, compartido entre hilos
+    """
+    def __init__(self, peticiones_por_segundo):
+        self.intervalo = 1.0 / peticiones_por_segundo if peticiones_por_segundo > 0 else 0
+        self.lock = threading.Lock()
+        self.proximo_turno = time.monotonic()
+    
+    def esperar(self):
+        """
+        Bloquear hasta que haya un turno libre para la siguiente petición
+        """
+        if self.intervalo <= 0:
+            return
+        
+        with self.lock:
+            ahora = time.monotonic()
+            turno = max(ahora, self.proximo_turno)
+            self.proximo_turno = turno + self.intervalo
+        
+        if turno > ahora:
+            time.sleep(turno - ahora)
+
+def crear_sesion_http(max_conexiones):
+    """
+    Crear una sesión HTTP con conexiones persistentes y compresión
+    """
+    sesion = requests.Session()
+    adaptador = HTTPAdapter(pool_connections=max_conexiones, pool_maxsize=max_conexiones)
+    sesion.mount('https://', adaptador)
+    sesion.mount('http://', adaptador)
+    sesion.headers.update({'Accept-Encoding': 'gzip, deflate'})
+    return sesion
+
+class CheckpointIngesta:
+    """
+    Registro local de los lotes ya cargados de una ejecución, para reanudarla
+    si se interrumpe sin volver a descargar ni insertar lo terminado
+    """
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.estado = None
+    
+    def iniciar(self, firma):
+        """
+        Retomar el checkpoint pendiente de la misma consulta o empezar uno nuevo.
+        Retorna True si se reanuda una ejecución interrumpida.
+        """
+        if os.path.exists(self.ruta):
+            try:
+                with open(self.ruta, encoding='utf-8') as archivo:
+                    estado = json.load(archivo)
+                
+                if estado.get('firma') == firma:
+                    self.estado = estado
+                    return True
+                
+                logging.warning("⚠️  El checkpoint existente es de otra consulta, se descarta")
+            except (OSError, ValueError) as e:
+                logging.warning(f"⚠️  No se pudo leer el checkpoint {self.ruta}: {e}")
+        
+        self.estado = {
+            'id_ejecucion': datetime.now().strftime('%Y%m%d%H%M%S'),
+            'firma': firma,
+            'offsets': [],
+            'lotes': 0,
+            'totales': {'descargados': 0, 'validos': 0, 'insertados': 0},
+            'marca_agua': None
+        }
+        self.guardar()
+        return False
+    
+    def offsets_completados(self):
+        return set(self.estado['offsets'])
+    
+    def registrar_lote(self, offsets, totales, marca_agua):
+        """
+        Registrar un lote ya confirmado en la base de datos
+        """
+        self.estado['offsets'].extend(offsets)
+        self.estado['lotes'] += 1
+        self.estado['totales'] = dict(totales)
+        self.estado['marca_agua'] = marca_agua.isoformat() if marca_agua is not None else None
+        self.guardar()
+    
+    def guardar(self):
+        """
+        Escribir el checkpoint de forma atómica
+        """
+        temporal = self.ruta + '.tmp'
+        with open(temporal, 'w', encoding='utf-8') as archivo:
+            json.dump(self.estado, archivo)
+        os.replace(temporal, self.ruta)
+    
+    def finalizar(self):
+        """
+        Eliminar el checkpoint al terminar la ejecución completa
+        """
+        if os.path.exists(self.ruta):
+            os.remove(self.ruta)
+        self.estado = None
+
+class CachePaginas:
+    """
+    Caché local de las páginas crudas de la API (NDJSON comprimido con gzip),
+    organizada por ejecución y offset para reprocesar sin consultar la API
+    """
+    def __init__(self, directorio, max_mb, max_dias):
+        self.directorio = directorio
+        self.max_bytes = max_mb * 1024 * 1024
+        self.max_dias = max_dias
+    
+    def listar_ejecuciones(self):
+        if not os.path.isdir(self.directorio):
+            return []
+        return sorted(
+            nombre for nombre in os.listdir(self.directorio)
+            if os.path.isdir(os.path.join(self.directorio, nombre))
+        )
+    
+    def guardar_pagina(self, id_ejecucion, offset, pagina):
+        """
+        Guardar una página cruda; se escribe en un temporal para no dejar archivos a medias
+        """
+        carpeta = os.path.join(self.directorio, id_ejecucion)
+        os.makedirs(carpeta, exist_ok=True)
+        
+        ruta = os.path.join(carpeta, f"{offset:010d}.ndjson.gz")
+        temporal = ruta + '.tmp'
+        with gzip.open(temporal, 'wt', encoding='utf-8') as archivo:
+            for registro in pagina:
+                archivo.write(json.dumps(registro, ensure_ascii=False))
+                archivo.write('\n')
+        os.replace(temporal, ruta)
+    
+    def iterar_paginas(self, id_ejecucion, omitir=()):
+        """
+        Generar (offset, página) en orden desde la caché de una ejecución ('latest' = la última)
+        """
+        if id_ejecucion == 'latest':
+            ejecuciones = self.listar_ejecuciones()
+            if not ejecuciones:
+                raise FileNotFoundError(f"No hay páginas en la caché {self.directorio}")
+            id_ejecucion = ejecuciones[-1]
+        
+        carpeta = os.path.join(self.directorio, id_ejecucion)
+        logging.info(f"[INFO] Reprocesando páginas de la caché: {carpeta}")
+        
+        for nombre in sorted(os.listdir(carpeta)):
+            if not nombre.endswith('.ndjson.gz'):
+                continue
+            
+            offset = int(nombre.split('.')[0])
+            if offset in omitir:
+                continue
+            
+            with gzip.open(os.path.join(carpeta, nombre), 'rt', encoding='utf-8') as archivo:
+                yield offset, [json.loads(linea) for linea in archivo if linea.strip()]
+    
+    def aplicar_retencion(self, excluir=None):
+        """
+        Eliminar las ejecuciones más antiguas que max_dias o que excedan max_mb en total
+        """
+        ejecuciones = []
+        for id_ejecucion in self.listar_ejecuciones():
+            if id_ejecucion == excluir:
+                continue
+            
+            carpeta = os.path.join(self.directorio, id_ejecucion)
+            rutas = [os.path.join(carpeta, nombre) for nombre in os.listdir(carpeta)]
+            tamano = sum(os.path.getsize(ruta) for ruta in rutas)
+            modificado = max([os.path.getmtime(ruta) for ruta in rutas], default=os.path.getmtime(carpeta))
+            ejecuciones.append((modificado, id_ejecucion, tamano))
+        
+        ejecuciones.sort()
+        limite_antiguedad = time.time() - self.max_dias * 86400
+        total = sum(tamano for _, _, tamano in ejecuciones)
+        
+        for modificado, id_ejecucion, tamano in ejecuciones:
+            if modificado >= limite_antiguedad and total <= self.max_bytes:
+                break
+            
+            shutil.rmtree(os.path.join(self.directorio, id_ejecucion), ignore_errors=True)
+            total -= tamano
+            logging.info(f"[INFO] Caché de la ejecución {id_ejecucion} eliminada")
+
+def quitar_espacios(serie):
+    return serie.astype(str).str.strip()
+
+def limpiar_nombre_diagnostico(serie):
+    serie = serie.str.replace(r'[^\w\s\-\.]', '', regex=True)
+    return serie.str.replace(r'\s+', ' ', regex=True)
+
+def version_transformacion(funcion):
+    """
+    Huella del código de una transformación: si la función cambia, sus resultados guardados dejan de servir
+    """
+    codigo = funcion.__code__
+    return hashlib.md5(codigo.co_code + repr(codigo.co_consts).encode()).hexdigest()[:8]
+
+class CacheNormalizacion:
+    """
+    Memo LRU de texto original -> texto normalizado por cada transformación.
+    Cada transformación se calcula una vez por valor distinto (factorize -> limpiar
+    los únicos -> take), así el costo depende del vocabulario y no de las filas.
+    Se guarda en disco para reutilizarlo entre ejecuciones, bajo el nombre y la
+    versión (huella del código) de la transformación.
+    """
+    def __init__(self, ruta=None, max_entradas=200000):
+        self.ruta = ruta
+        self.max_entradas = max_entradas
+        self.memos = {}
+        self.nuevos = {}
+        
+        if ruta and os.path.exists(ruta):
+            try:
+                with open(ruta, encoding='utf-8') as archivo:
+                    guardado = json.load(archivo)
+                for nombre, pares in guardado.items():
+                    self.memos[nombre] = OrderedDict(pares)
+            except (OSError, ValueError) as e:
+                logging.warning(f"⚠️  No se pudo leer la caché de normalización {ruta}: {e}")
+    
+    def normalizar(self, serie, nombre, funcion):
+        """
+        Aplicar funcion (sobre una Serie de textos) a cada valor distinto de serie; los nulos se conservan
+        """
+        codigos, unicos = pd.factorize(serie.astype(object))
+        if len(unicos) == 0:
+            return serie
+        
+        clave = f"{nombre}@{version_transformacion(funcion)}"
+        memo = self.memos.get(clave)
+        if memo is None:
+            # Lo calculado con otra versión de la transformación se descarta
+            for anterior in [guardada for guardada in self.memos if guardada.split('@')[0] == nombre]:
+                del self.memos[anterior]
+            memo = self.memos[clave] = OrderedDict()
+        
+        unicos = list(unicos)
+        faltantes = [valor for valor in unicos if valor not in memo]
+        if faltantes:
+            limpios = funcion(pd.Series(faltantes, dtype=object))
+            nuevos = self.nuevos.setdefault(clave, {})
+            for original, limpio in zip(faltantes, limpios):
+                memo[original] = limpio
+                nuevos[original] = limpio
+        
+        valores = np.empty(len(unicos) + 1, dtype=object)
+        for posicion, valor in enumerate(unicos):
+            memo.move_to_end(valor)
+            valores[posicion] = memo[valor]
+        valores[-1] = None  # el código -1 de factorize (nulo) toma la última posición
+        
+        while len(memo) > self.max_entradas:
+            memo.popitem(last=False)
+        
+        return pd.Series(valores.take(codigos), index=serie.index, dtype=object)
+    
+    def extraer_nuevos(self):
+        """
+        Retornar y olvidar las entradas calculadas desde la última llamada
+        """
+        nuevos, self.nuevos = self.nuevos, {}
+        return nuevos
+    
+    def incorporar(self, nuevos):
+        """
+        Agregar entradas calculadas en otro proceso
+        """
+        for nombre, pares in nuevos.items():
+            memo = self.memos.setdefault(nombre, OrderedDict())
+            memo.update(pares)
+            while len(memo) > self.max_entradas:
+                memo.popitem(last=False)
+    
+    def guardar(self):
+        """
+        Escribir la caché de forma atómica, de la entrada menos usada a la más reciente.
+        El temporal es propio de cada proceso e hilo: las particiones del backfill guardan a la vez.
+        """
+        if not self.ruta:
+            return
+        
+        temporal = f"{self.ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as archivo:
+            json.dump({nombre: list(memo.items()) for nombre, memo in self.memos.items()}, archivo)
+        os.replace(temporal, self.ruta)
+
+# Formatos candidatos para fecha_atencion (Socrata usa el primero)
+FORMATOS_FECHA = [
+    '%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d',
+    '%d/%m/%Y %H:%M:%S', '%d/%m/%Y', '%Y/%m/%d'
+]
+
+class ParserFechas:
+    """
+    Convertir textos de fecha una vez por valor distinto: el formato dominante se detecta
+    en una muestra y se aplica explícito, luego los demás FORMATOS_FECHA en orden; solo los
+    textos que no cumplen ninguno pasan por la conversión flexible.
+    Los resultados quedan en memoria para los lotes siguientes; el memo se comparte entre
+    los hilos de las fuentes y se protege con un lock.
+    """
+    def __init__(self, max_entradas=100000, tamano_muestra=200):
+        self.max_entradas = max_entradas
+        self.tamano_muestra = tamano_muestra
+        self.memo = {}
+        self.lock = threading.Lock()
+    
+    def convertir(self, serie):
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            return serie
+        
+        codigos, unicos = pd.factorize(serie.astype(object))
+        with self.lock:
+            faltantes = [valor for valor in unicos if valor not in self.memo]
+            if faltantes:
+                if len(self.memo) + len(faltantes) > self.max_entradas:
+                    self.memo.clear()
+                self.memo.update(zip(faltantes, self.parsear(faltantes)))
+            
+            # El código -1 de factorize (nulo) toma la última posición
+            valores = np.array([self.memo[valor] for valor in unicos] + [np.datetime64('NaT')], dtype='datetime64[ns]')
+        return pd.Series(valores.take(codigos), index=serie.index)
+    
+    def detectar_formato(self, textos):
+        muestra = pd.Series(textos[:self.tamano_muestra], dtype=object)
+        aciertos = {
+            formato: pd.to_datetime(muestra, format=formato, errors='coerce').notna().sum()
+            for formato in FORMATOS_FECHA
+        }
+        formato = max(aciertos, key=aciertos.get)
+        return formato if aciertos[formato] else None
+    
+    def parsear(self, textos):
+        textos = pd.Series(textos, dtype=object)
+        formato = self.detectar_formato(textos)
+        formatos = ([formato] if formato else []) + [otro for otro in FORMATOS_FECHA if otro != formato]
+        
+        # Cada formato explícito solo sobre lo que los anteriores no convirtieron
+        fechas = np.full(len(textos), np.datetime64('NaT'), dtype='datetime64[ns]')
+        for formato in formatos:
+            pendientes = np.isnat(fechas)
+            if not pendientes.any():
+                break
+            fechas[pendientes] = pd.to_datetime(
+                textos[pendientes], format=formato, errors='coerce'
+            ).to_numpy(dtype='datetime64[ns]')
+        
+        for posicion in np.flatnonzero(np.isnat(fechas)):
+            fecha = pd.to_datetime(textos.iloc[posicion], errors='coerce')
+            if fecha is not pd.NaT and fecha.tzinfo is not None:
+                fecha = fecha.tz_convert(None)
+            fechas[posicion] = np.datetime64(fecha, 'ns') if fecha is not pd.NaT else np.datetime64('NaT')
+        
+        return fechas
+
+# Caché de normalización de cada proceso del pool de limpieza (ver iniciar_proceso_limpieza)
+normalizador_proceso = None
+
+# Fechas ya convertidas en este proceso (se conservan entre lotes)
+parser_fechas = ParserFechas()
+
+def iniciar_proceso_limpieza(ruta, max_entradas):
+    global normalizador_proceso
+    normalizador_proceso = CacheNormalizacion(ruta, max_entradas)
+
+# Columnas de pocos valores distintos que se guardan como categóricas tras la limpieza
+COLUMNAS_CATEGORICAS = [
+    'periodo', 'sexo', 'tipo_edad', 'procedencia', 'departamento', 'diagnostico', 'regimen', 'eapb'
+]
+
+def compactar_columnas(df):
+    """
+    Pasar las columnas repetitivas a categóricas y edad/a_o al entero más pequeño posible.
+    Deduplicar y mapear sobre categóricas opera con los códigos y no con cada texto.
+    """
+    for col in COLUMNAS_CATEGORICAS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    
+    for col in ('edad', 'a_o'):
+        df[col] = pd.to_numeric(df[col], downcast='integer')
+    
+    return df
+
+def nombre_regla(regla):
+    """
+    Nombre corto de una regla de validación para el conteo de rechazos
+    """
+    return f"{regla['campo']} ({regla['tipo']})"
+
+def evaluar_reglas(df, reglas):
+    """
+    Combinar todas las reglas en una sola máscara sin filtrar el DataFrame regla por regla.
+    Cada fila rechazada se atribuye a la primera regla que incumple.
+    Retorna (máscara de filas válidas, regla que rechazó cada fila, rechazos por regla).
+    """
+    validas = pd.Series(True, index=df.index)
+    motivos = pd.Series(None, index=df.index, dtype=object)
+    rechazos = {}
+    
+    for regla in reglas:
+        fallan = validas & ~mascara_regla(df, regla).fillna(False).astype(bool)
+        cantidad = int(fallan.sum())
+        if cantidad:
+            nombre = nombre_regla(regla)
+            rechazos[nombre] = cantidad
+            motivos[fallan] = nombre
+            validas &= ~fallan
+    
+    return validas, motivos, rechazos
+
+def limpiar_bloque(datos, normalizador=None, reglas=REGLAS_VALIDACION, con_rechazados=False):
+    """
+    Limpiar y validar un bloque de registros.
+    Retorna (DataFrame válido con su huella hash_alto/hash_bajo, registros rechazados por regla,
+    filas rechazadas con su regla si con_rechazados, entradas nuevas de la caché de normalización).
+    Es una función de módulo para poder ejecutarse en un pool de procesos.
+    """
+    if normalizador is None:
+        normalizador = normalizador_proceso if normalizador_proceso is not None else CacheNormalizacion()
+    
+    df = pd.DataFrame(datos)
+    
+    # Limpiar espacios en blanco (los nulos se conservan como nulos); los campos cargados
+    # se normalizan una vez por valor distinto
+    for col in df.columns:
+        if pd.api.types.is_string_dtype(df[col]):
+            if col in COLUMNAS_API:
+                df[col] = normalizador.normalizar(df[col], 'espacios', quitar_espacios)
+            else:
+                df[col] = df[col].where(df[col].isna(), df[col].astype(str).str.strip())
+    
+    # Convertir edad, año y fecha; los valores inválidos quedan nulos
+    df['edad'] = pd.to_numeric(df['edad'], errors='coerce')
+    df['a_o'] = pd.to_numeric(df['a_o'], errors='coerce')
+    df['fecha_atencion'] = parser_fechas.convertir(df['fecha_atencion'])
+    
+    # Limpiar texto de diagnósticos
+    df['nombre_diagnostico'] = normalizador.normalizar(df['nombre_diagnostico'], 'nombre_diagnostico',
+                                                       limpiar_nombre_diagnostico)
+    
+    # Aplicar las reglas de validación (las mismas que se envían a la API) en una sola pasada
+    validas, motivos, rechazos = evaluar_reglas(df, reglas)
+    rechazados = df[~validas].assign(regla_rechazo=motivos[~validas]) if con_rechazados and rechazos else None
+    df = df[validas].copy()
+    
+    # Crear huella única para cada registro para detectar duplicados
+    df['hash_alto'], df['hash_bajo'] = calcular_huellas(df)
+    
+    return df, rechazos, rechazados, normalizador.extraer_nuevos()
+
+def expresion_regla(regla):
+    """
+    Regla de validación como expresión de Polars (True = cumple; los nulos no cumplen)
+    """
+    columna = pl.col(regla['campo'])
+    
+    if regla['tipo'] == 'rango':
+        condicion = columna.is_between(regla['minimo'], regla['maximo'])
+    elif regla['tipo'] == 'valores':
+        condicion = columna.is_in(regla['valores'])
+    elif regla['tipo'] == 'fecha':
+        condicion = columna.is_not_null()
+    else:
+        condicion = columna.is_not_null() & (columna.str.len_chars() > 0)
+    return condicion.fill_null(False)
+
+def limpiar_bloque_polars(datos, reglas=REGLAS_VALIDACION, con_rechazados=False):
+    """
+    Misma limpieza, validación y huella que limpiar_bloque, ejecutadas con Polars
+    (columnar y multihilo). Retorna (DataFrame de pandas válido con su huella,
+    registros rechazados por regla, filas rechazadas con su regla si con_rechazados).
+    """
+    if isinstance(datos, pd.DataFrame):
+        df = pl.from_pandas(datos)
+    else:
+        df = pl.from_dicts(datos, infer_schema_length=None) if len(datos) else pl.DataFrame()
+    
+    # Limpiar espacios, convertir edad y año, y limpiar texto de diagnósticos
+    df = df.with_columns(pl.col(pl.String).str.strip_chars())
+    df = df.with_columns(
+        pl.col('edad').cast(pl.Float64, strict=False),
+        pl.col('a_o').cast(pl.Float64, strict=False),
+        pl.col('nombre_diagnostico').str.replace_all(r'[^\w\s\-\.]', '').str.replace_all(r'\s+', ' ')
+    )
+    
+    # Fechas: una conversión por texto distinto con el mismo parser del motor pandas
+    textos_fecha = df.get_column('fecha_atencion').drop_nulls().unique().to_list()
+    fechas = parser_fechas.convertir(pd.Series(textos_fecha, dtype=object)).to_numpy()
+    df = df.with_columns(
+        pl.col('fecha_atencion').replace_strict(
+            textos_fecha, pl.Series(fechas, dtype=pl.Datetime('ns')), default=None, return_dtype=pl.Datetime('ns')
+        )
+    )
+    
+    # Todas las reglas en una expresión: la primera regla incumplida es el motivo del rechazo
+    motivo = pl.lit(None, dtype=pl.String)
+    for regla in reversed(reglas):
+        motivo = pl.when(~expresion_regla(regla)).then(pl.lit(nombre_regla(regla))).otherwise(motivo)
+    df = df.with_columns(motivo.alias('regla_rechazo'))
+    
+    conteo = dict(df.get_column('regla_rechazo').drop_nulls().value_counts().iter_rows())
+    rechazos = {nombre_regla(regla): conteo[nombre_regla(regla)] for regla in reglas if nombre_regla(regla) in conteo}
+    
+    rechazados = None
+    if con_rechazados and rechazos:
+        rechazados = df.filter(pl.col('regla_rechazo').is_not_null()).to_pandas()
+    df = df.filter(pl.col('regla_rechazo').is_null()).drop('regla_rechazo')
+    
+    # Huella: mismo texto canónico que texto_huella
+    partes = []
+    for campo in COLUMNAS_HUELLA:
+        if campo in ('a_o', 'edad'):
+            partes.append(pl.col(campo).cast(pl.Int64).cast(pl.String))
+        elif campo == 'fecha_atencion':
+            partes.append(pl.col(campo).dt.strftime('%Y-%m-%d %H:%M:%S'))
+        else:
+            partes.append(pl.col(campo).fill_null(''))
+    textos = df.select(pl.concat_str(partes, separator='|')).to_series().to_numpy().astype(object)
+    
+    resultado = df.to_pandas()
+    for col in resultado.columns:
+        if pd.api.types.is_string_dtype(resultado[col]):
+            resultado[col] = resultado[col].astype(object).where(resultado[col].notna(), None)
+    resultado['hash_alto'], resultado['hash_bajo'] = (
+        huellas_desde_textos(textos) if len(textos) else (np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.uint64))
+    )
+    
+    return resultado, rechazos, rechazados
+
+# Tablas maestras: columna id y columnas de su llave única
+DIMENSIONES = {
+    'departamentos': ('id_departamento', ['nombre_departamento']),
+    'municipios': ('id_municipio', ['nombre_municipio', 'id_departamento']),
+    'diagnosticos': ('id_diagnostico', ['codigo_diagnostico']),
+    'regimenes_salud': ('id_regimen', ['nombre_regimen']),
+    'eapb': ('id_eapb', ['nombre_eapb']),
+}
+
+class CacheDimensiones:
+    """
+    IDs de las tablas maestras en memoria, compartidos entre ejecuciones programadas y fuentes.
+    Cada tabla se lee completa una sola vez; después basta comparar COUNT(*) y MAX(id):
+    si solo hubo inserciones se leen las filas con id mayor, y si no se recarga la tabla.
+    Los mapas publicados no se modifican: cada sincronización arma uno nuevo y lo reemplaza,
+    así los hilos de otras fuentes pueden recorrer el que obtuvieron con mapa() sin el lock.
+    """
     def __init__(self):
+        self.mapas = {tabla: {} for tabla in DIMENSIONES}
+        self.estado = {}
+        self.municipios = None
+        self.version_municipios = None
+        self.lock = threading.Lock()
+    
+    def sincronizar(self, conexion):
+        """
+        Poner al día los mapas con las filas de las tablas maestras. Se lee con una instantánea
+        nueva (commit antes de leer): en REPEATABLE READ la conexión de una fuente puede seguir
+        viendo una instantánea anterior a las inserciones de otra fuente.
+        """
+        with self.lock:
+            conexion.commit()
+            cursor = conexion.cursor()
+            for tabla, (columna_id, llave) in DIMENSIONES.items():
+                cursor.execute(f"SELECT COUNT(*), MAX({columna_id}) FROM {tabla}")
+                conteo, id_maximo = cursor.fetchone()
+                estado = (conteo, id_maximo or 0)
+                anterior = self.estado.get(tabla)
+                if anterior == estado:
+                    continue
+                if anterior is not None and estado[1] < anterior[1]:
+                    # Una lectura más antigua que la caché no la reemplaza
+                    continue
+                
+                columnas = ', '.join([columna_id] + llave)
+                filas = None
+                if anterior is not None:
+                    # Solo inserciones: las filas nuevas son exactamente las de id mayor
+                    cursor.execute(f"SELECT {columnas} FROM {tabla} WHERE {columna_id} > %s AND {columna_id} <= %s",
+                                   (anterior[1], estado[1]))
+                    filas = cursor.fetchall()
+                    if anterior[0] + len(filas) != conteo:
+                        filas = None
+                
+                if filas is None:
+                    cursor.execute(f"SELECT {columnas} FROM {tabla} WHERE {columna_id} <= %s ORDER BY {columna_id}",
+                                   (estado[1],))
+                    filas = cursor.fetchall()
+                    mapa = {}
+                else:
+                    mapa = dict(self.mapas[tabla])
+                
+                for fila in filas:
+                    mapa[fila[1] if len(fila) == 2 else tuple(fila[1:])] = fila[0]
+                self.mapas[tabla] = mapa
+                self.estado[tabla] = estado
+            cursor.close()
+    
+    def mapa(self, tabla):
+        with self.lock:
+            return self.mapas[tabla]
+    
+    def tabla_municipios(self):
+        """
+        Municipios indexados por su llave completa (procedencia, departamento) con su id_municipio,
+        para resolver la llave foránea con un join vectorizado
+        """
+        with self.lock:
+            version = (self.estado.get('municipios'), self.estado.get('departamentos'))
+            if self.version_municipios != version:
+                nombres_departamento = {id_departamento: nombre for nombre, id_departamento in self.mapas['departamentos'].items()}
+                filas = [
+                    (municipio, nombres_departamento.get(id_departamento), id_municipio)
+                    for (municipio, id_departamento), id_municipio in self.mapas['municipios'].items()
+                ]
+                self.municipios = pd.DataFrame(
+                    filas, columns=['procedencia', 'departamento', 'id_municipio']
+                ).dropna().set_index(['procedencia', 'departamento'])
+                self.version_municipios = version
+            return self.municipios
+
+def mapear_ids(serie, mapa):
+    """
+    Resolver los IDs de una columna con el mapa de una tabla maestra (NaN si no está).
+    Sobre una categórica cada categoría se busca una sola vez y el resultado se toma por sus códigos.
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        # El código -1 (nulo) toma la última posición
+        ids = np.array([mapa.get(categoria, np.nan) for categoria in serie.cat.categories] + [np.nan], dtype=float)
+        return pd.Series(ids.take(serie.cat.codes.to_numpy()), index=serie.index)
+    return serie.astype(object).map(mapa)
+
+def categoria_diagnostico(codigo):
+    """
+    Categoría de un diagnóstico según la letra inicial de su código
+    """
+    if codigo.startswith('R'):
+        return 'Síntomas y signos'
+    if codigo.startswith('S') or codigo.startswith('T'):
+        return 'Traumatismos'
+    if codigo.startswith('V') or codigo.startswith('W'):
+        return 'Causas externas'
+    if codigo.startswith('M'):
+        return 'Sistema musculoesquelético'
+    return 'Urgencias'
+
+def tipo_regimen(regimen):
+    if regimen in ['CONTRIBUTIVO', 'PARTICULAR']:
+        return 'Privado'
+    if regimen in ['VINCULADO', 'OTRO']:
+        return 'Especial'
+    return 'Público'
+
+def tipo_entidad_eapb(eapb):
+    if 'EPS' in eapb.upper():
+        return 'EPS'
+    if 'ARS' in eapb.upper():
+        return 'ARS'
+    if 'VINCULADOS' in eapb.upper():
+        return 'Vinculados'
+    return 'EAPB'
+
+class ActualizadorMorbilidad:
+    def __init__(self, config=None, fuente=None, sesion=None, dimensiones=None):
         self.conexion = None
-        self.api_url = "https://www.datos.gov.co/resource/w6k7-5tme.json"
+        self.config = config if config is not None else cargar_configuracion()
         self.ultima_actualizacion = None
         
-    def conectar_mysql(self):
+        # Fuente de datos: por defecto el recurso principal de [API]
+        fuente = fuente if fuente is not None else cargar_fuentes(self.config)[0]
+        self.nombre_fuente = fuente['nombre']
+        self.fuente_principal = fuente['principal']
+        self.api_url = fuente['url']
+        self.mapeo_columnas = fuente['mapeo_columnas']
+        self.campos_origen = {destino: origen for origen, destino in self.mapeo_columnas.items()}
+        self.intervalo_horas = fuente['intervalo_horas']
+        
+        # Parámetros de descarga concurrente
+        self.tamano_pagina = self.config.getint('API', 'page_size', fallback=1000)
+        self.max_peticiones_concurrentes = fuente['max_peticiones']
+        self.limitador = LimitadorTasa(fuente['peticiones_por_segundo'])
+        
+        # Sesión HTTP (compartida entre fuentes si se recibe) y reintentos por petición
+        self.timeout = self.config.getint('API', 'timeout', fallback=30)
+        self.reintentos = self.config.getint('API', 'retry_attempts', fallback=3)
+        self.espera_base_reintento = self.config.getfloat('API', 'retry_backoff_seconds', fallback=1.0)
+        self.sesion = sesion if sesion is not None else crear_sesion_http(self.max_peticiones_concurrentes)
+        
+        # IDs de las tablas maestras, conservados entre ejecuciones (compartidos entre fuentes si se recibe)
+        self.dimensiones = dimensiones if dimensiones is not None else CacheDimensiones()
+        
+        # Modo de descarga: páginas JSON o exportación CSV completa
+        self.modo_descarga = self.config.get('API', 'download_mode', fallback='json').lower()
+        self.filas_por_bloque_csv = self.config.getint('API', 'csv_chunk_rows', fallback=50000)
+        self.directorio_descargas = self.config.get('API', 'download_dir', fallback='descargas')
+        
+        # Pedir solo las columnas que se cargan y filtrar en el servidor con las reglas de validación
+        self.filtros_en_servidor = self.config.getboolean('API', 'server_side_filters', fallback=True)
+        
+        # Descarga incremental por marca de agua
+        self.modo_incremental = self.config.getboolean('Incremental', 'enabled', fallback=True)
+        self.campo_marca_agua = fuente['campo_marca_agua']
+        self.dias_solape = self.config.getint('Incremental', 'overlap_days', fallback=3)
+        self.marca_agua = None
+        
+        # Pipeline por lotes: descarga, limpieza y carga solapadas
+        self.modo_streaming = self.config.getboolean('Pipeline', 'streaming', fallback=True)
+        self.paginas_por_lote = self.config.getint('Pipeline', 'pages_per_batch', fallback=10)
+        self.max_paginas_en_vuelo = self.config.getint('Pipeline', 'max_pages_in_flight', fallback=8)
+        
+        # Limpieza por bloques en un pool de procesos (workers = 1 limpia en el proceso actual)
+        self.procesos_limpieza = self.config.getint('Cleaning', 'workers', fallback=1)
+        self.filas_por_bloque_limpieza = self.config.getint('Cleaning', 'chunk_rows', fallback=50000)
+        self.pool_limpieza = None
+        self.rechazos = {}
+        
+        # Motor de limpieza, validación y huella: pandas (por defecto) o polars
+        self.motor_limpieza = self.config.get('Cleaning', 'backend', fallback='pandas').strip().lower()
+        if self.motor_limpieza == 'polars' and pl is None:
+            logging.warning("⚠️  Polars no está instalado, se usa el motor pandas")
+            self.motor_limpieza = 'pandas'
+        
+        # Detección de registros nuevos: memory (hashes en memoria) o database (anti-join en MySQL)
+        self.modo_deduplicacion = self.config.get('Dedup', 'mode', fallback='memory').strip().lower()
+        
+        # Filtro de Bloom en disco para no consultar en la base de datos los registros seguro nuevos
+        self.usar_filtro_bloom = self.config.getboolean('Dedup', 'bloom_filter', fallback=False)
+        self.minutos_relectura_bloom = self.config.getint('Dedup', 'bloom_rescan_minutes', fallback=60)
+        self.filtro_bloom = None
+        
+        # Reglas de validación y archivo opcional con las filas rechazadas
+        self.reglas_validacion = cargar_reglas_validacion(self.config)
+        archivo_rechazados = self.config.get('Cleaning', 'rejected_rows_file', fallback='').strip()
+        self.archivo_rechazados = self.ruta_fuente(archivo_rechazados) if archivo_rechazados else None
+        
+        # Caché persistente de textos normalizados (se calcula una vez por valor distinto)
+        ruta_normalizacion = self.config.get('Cleaning', 'normalization_cache_file', fallback='cache_normalizacion.json').strip()
+        self.normalizador = CacheNormalizacion(
+            self.ruta_fuente(ruta_normalizacion) if ruta_normalizacion else None,
+            self.config.getint('Cleaning', 'normalization_cache_max_entries', fallback=200000)
+        )
+        
+        # Condiciones $where adicionales (particiones del backfill)
+        self.filtros_adicionales = []
+        # El backfill verifica la versión de los hashes una vez antes de lanzar las particiones
+        self.verificar_hashes = True
+        self.resumen_ejecucion = None
+        
+        # Caché local de páginas crudas y reprocesamiento offline
+        self.id_ejecucion = None
+        self.guardar_en_cache = self.config.getboolean('Cache', 'enabled', fallback=False)
+        self.ejecucion_offline = self.config.get('Cache', 'offline_run', fallback='').strip()
+        self.cache = None
+        if self.guardar_en_cache or self.ejecucion_offline:
+            self.cache = CachePaginas(
+                self.ruta_fuente(self.config.get('Cache', 'dir', fallback='cache_paginas')),
+                self.config.getint('Cache', 'max_size_mb', fallback=2048),
+                self.config.getint('Cache', 'max_age_days', fallback=30)
+            )
+        
+        # Checkpoints para reanudar una ejecución interrumpida
+        self.checkpoint = None
+        if self.config.getboolean('Checkpoint', 'enabled', fallback=True):
+            self.checkpoint = CheckpointIngesta(self.ruta_fuente(self.config.get('Checkpoint', 'file', fallback='checkpoint_ingesta.json')))
+    
+    def ruta_fuente(self, ruta):
+        """
+        Ruta local propia de la fuente: las fuentes adicionales agregan su nombre
+        """
+        if self.fuente_principal:
+            return ruta
+        base, extension = os.path.splitext(ruta)
+        return f"{base}_{self.nombre_fuente}{extension}"
+    
+    def campo_origen(self, campo):
+        """
+        Nombre en el recurso de un campo canónico según column_map
+        """
+        return self.campos_origen.get(campo, campo)
+    
+    def seleccion_columna(self, campo):
+        """
+        Expresión $select de un campo canónico, con alias si el recurso lo llama distinto
+        """
+        origen = self.campo_origen(campo)
+        return f"{origen} AS {campo}" if origen != campo else campo
+    
+    def conectar_mysql(self):
+        """
+        Conectar a MySQL (XAMPP)
+        """
+        try:
+            self.conexion = mysql.connector.connect(
+                host='localhost',
+                user='root',
+                password='',
+                port=3306,
+                database='morbilidad_urgencias',
+                autocommit=False
+            )
+            logging.info("[SUCCESS] Conexión a MySQL exitosa")
+            return True
+        except mysql.connector.Error as e:
+            logging.error(f"[ERROR] Error conectando a MySQL: {e}")
+            return False
+    
+    def crear_tabla_marcas_agua(self):
+        """
+        Crear tabla con la marca de agua de cada ejecución
+        """
+        try:
+            cursor = self.conexion.cursor()
+            
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS marcas_agua (
+                    id INT AUTO_INCREMENT PRIMARY KEY,
+                    recurso VARCHAR(255) NOT NULL,
+                    campo VARCHAR(50) NOT NULL,
+                    valor DATETIME NOT NULL,
+                    registros_descargados INT,
+                    fecha_ejecucion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    INDEX idx_recurso_campo (recurso, campo, id)
+                )
+            """)
+            
+            self.conexion.commit()
+            cursor.close()
+            
+        except Exception as e:
+            logging.error(f"❌ Error creando tabla de marcas de agua: {e}")
+    
+    def obtener_marca_agua(self):
+        """
+        Obtener la última marca de agua registrada para el recurso
+        """
+        try:
+            cursor = self.conexion.cursor()
+            cursor.execute("""
+                SELECT valor FROM marcas_agua
+                WHERE recurso = %s AND campo = %s
+                ORDER BY id DESC LIMIT 1
+            """, (self.api_url, self.campo_marca_agua))
+            fila = cursor.fetchone()
+            cursor.close()
+            
+            if fila:
+                logging.info(f"[INFO] Marca de agua actual ({self.campo_marca_agua}): {fila[0]}")
+                return fila[0]
+            
+            logging.info("[INFO] Sin marca de agua previa, se descargará el recurso completo")
+            return None
+            
+        except Exception as e:
+            logging.error(f"[ERROR] Error obteniendo marca de agua: {e}")
+            return None
+    
+    def calcular_marca_agua(self, datos, marca_previa=None):
+        """
+        Calcular la nueva marca de agua (máximo del campo) sobre los datos ya validados.
+        Los valores futuros se ignoran: una fecha mal digitada (p. ej. 2099) dejaría la marca
+        por delante del presente y las ejecuciones siguientes no pedirían nada.
+        """
+        if marca_previa is None:
+            marca_previa = self.marca_agua
+        
+        if isinstance(datos, pd.DataFrame):
+            serie = datos.get(self.campo_marca_agua, pd.Series(dtype=object))
+        else:
+            serie = pd.Series([registro.get(self.campo_marca_agua) for registro in datos])
+        
+        en_utc = self.campo_marca_agua.startswith(':')
+        valores = pd.to_datetime(serie, errors='coerce', utc=en_utc).dropna()
+        valores = valores[valores <= (pd.Timestamp.now(tz='UTC') if en_utc else pd.Timestamp.now())]
+        
+        if valores.empty:
+            return marca_previa
+        
+        maximo = valores.max()
+        if maximo.tzinfo is not None:
+            maximo = maximo.tz_convert(None)
+        maximo = maximo.to_pydatetime()
+        
+        if marca_previa is not None and marca_previa > maximo:
+            return marca_previa
+        return maximo
+    
+    def guardar_marca_agua(self, valor, registros_descargados):
+        """
+        Registrar la marca de agua alcanzada por la ejecución
+        """
+        try:
+            cursor = self.conexion.cursor()
+            cursor.execute("""
+                INSERT INTO marcas_agua (recurso, campo, valor, registros_descargados)
+                VALUES (%s, %s, %s, %s)
+            """, (self.api_url, self.campo_marca_agua, valor, registros_descargados))
+            
+            self.conexion.commit()
+            cursor.close()
+            logging.info(f"[INFO] Nueva marca de agua ({self.campo_marca_agua}): {valor}")
+            
+        except Exception as e:
+            logging.error(f"❌ Error guardando marca de agua: {e}")
+    
+    def parametros_consulta(self):
+        """
+        Parámetros SoQL comunes a todas las consultas ($select, $where y $order)
+        """
+        params = {'$order': ':id'}  # Orden estable para paginar en paralelo
+        condiciones = []
+        
+        # Las columnas renombradas por column_map llegan con su nombre canónico vía alias
+        if self.filtros_en_servidor:
+            columnas = [self.seleccion_columna(campo) for campo in COLUMNAS_API]
+            condiciones.extend(regla_a_soql(regla, self.campo_origen(regla['campo'])) for regla in self.reglas_validacion)
+        else:
+            columnas = ['*'] + [f"{origen} AS {destino}" for origen, destino in self.mapeo_columnas.items()]
+        condiciones.extend(self.filtros_adicionales)
+        
+        campo_marca = self.campo_origen(self.campo_marca_agua)
+        if self.modo_incremental and self.marca_agua is not None:
+            # Ventana de solape para registros que llegan tarde; los duplicados se descartan por hash
+            desde = self.marca_agua - timedelta(days=self.dias_solape)
+            condiciones.append(f"{campo_marca} >= '{desde.strftime('%Y-%m-%dT%H:%M:%S')}'")
+            params['$order'] = f"{campo_marca}, :id"
+        
+        if (self.modo_incremental and self.campo_marca_agua not in COLUMNAS_API
+                and (self.filtros_en_servidor or campo_marca.startswith(':'))):
+            # Los campos de sistema solo llegan si se piden explícitamente
+            columnas.append(self.seleccion_columna(self.campo_marca_agua))
+        
+        if columnas != ['*']:
+            params['$select'] = ', '.join(columnas)
+        if condiciones:
+            params['$where'] = ' AND '.join(condiciones)
+        
+        return params
+    
+    def calcular_espera_reintento(self, intento, retry_after=None):
+        """
+        Calcular la espera antes de un reintento: Retry-After si el servidor lo indica,
+        si no backoff exponencial con jitter
+        """
+        if retry_after:
+            try:
+                return max(0.0, float(retry_after))
+            except ValueError:
+                try:
+                    fecha = parsedate_to_datetime(retry_after)
+                    return max(0.0, (fecha - datetime.now(fecha.tzinfo)).total_seconds())
+                except (TypeError, ValueError):
+                    pass
+        
+        espera = self.espera_base_reintento * (2 ** intento)
+        return min(espera + random.uniform(0, espera), 60.0)
+    
+    def peticion_get(self, url, params=None, **kwargs):
+        """
+        GET sobre la sesión compartida respetando el límite de tasa.
+        Reintenta errores de red, 429 y 5xx hasta retry_attempts veces.
+        """
+        for intento in range(self.reintentos + 1):
+            self.limitador.esperar()
+            ultimo_intento = intento >= self.reintentos
+            
+            try:
+                response = self.sesion.get(url, params=params, timeout=self.timeout, **kwargs)
+            except ERRORES_RED as e:
+                if ultimo_intento:
+                    raise
+                espera = self.calcular_espera_reintento(intento)
+                logging.warning(f"⚠️  Error de red ({e}), reintento {intento + 1}/{self.reintentos} en {espera:.1f}s")
+                time.sleep(espera)
+                continue
+            
+            if response.status_code in (429, 500, 502, 503, 504) and not ultimo_intento:
+                espera = self.calcular_espera_reintento(intento, response.headers.get('Retry-After'))
+                response.close()
+                logging.warning(f"⚠️  HTTP {response.status_code}, reintento {intento + 1}/{self.reintentos} en {espera:.1f}s")
+                time.sleep(espera)
+                continue
+            
+            return response
+    
+    def contar_registros_api(self):
+        """
+        Consultar cuántos registros tiene el recurso para planificar los offsets
+        """
+        try:
+            params = self.parametros_consulta()
+            params.pop('$order')
+            params['$select'] = 'count(*)'
+            
+            response = self.peticion_get(self.api_url, params=params)
+            response.raise_for_status()
+            
+            data = response.json()
+            total = int(list(data[0].values())[0])
+            logging.info(f"[INFO] Registros disponibles en la API: {total}")
+            return total
+            
+        except Exception as e:
+            logging.warning(f"⚠️  No se pudo contar los registros de la API: {e}")
+            return None
+    
+    def descargar_pagina(self, offset):
+        """
+        Descargar una página de la API a partir del offset indicado.
+        Una página con JSON inválido (cuerpo incompleto) se vuelve a pedir.
+        """
+        params = self.parametros_consulta()
+        params['$limit'] = self.tamano_pagina
+        params['$offset'] = offset
+        
+        for intento in range(self.reintentos + 1):
+            response = self.peticion_get(self.api_url, params=params)
+            response.raise_for_status()
+            
+            try:
+                return response.json()
+            except ValueError as e:
+                if intento >= self.reintentos:
+                    raise
+                espera = self.calcular_espera_reintento(intento)
+                logging.warning(f"⚠️  Página {offset} con JSON inválido ({e}), reintento {intento + 1}/{self.reintentos} en {espera:.1f}s")
+                time.sleep(espera)
+    
+    def iterar_paginas_api(self, omitir=()):
+        """
+        Generar (offset, página) en orden, descargando en paralelo como máximo
+        max_paginas_en_vuelo páginas por delante del consumidor.
+        Los offsets de omitir (ya cargados) no se descargan.
+        """
+        limite = self.tamano_pagina
+        
+        # Planificar todos los offsets a partir del conteo inicial
+        total = self.contar_registros_api()
+        planificados = list(range(0, total, limite)) if total else []
+        offsets = [offset for offset in planificados if offset not in omitir]
+        ultima_llena = True
+        
+        if offsets:
+            with ThreadPoolExecutor(max_workers=self.max_peticiones_concurrentes) as executor:
+                pendientes = deque()
+                siguiente = 0
+                
+                try:
+                    while siguiente < len(offsets) or pendientes:
+                        while siguiente < len(offsets) and len(pendientes) < self.max_paginas_en_vuelo:
+                            offset = offsets[siguiente]
+                            pendientes.append((offset, executor.submit(self.descargar_pagina, offset)))
+                            siguiente += 1
+                        
+                        offset, futuro = pendientes.popleft()
+                        data = futuro.result()
+                        ultima_llena = len(data) >= limite
+                        yield offset, data
+                finally:
+                    for _, futuro in pendientes:
+                        futuro.cancel()
+        
+        # Continuar secuencialmente si no hubo conteo o llegaron registros después de contar
+        offset = len(planificados) * limite
+        while ultima_llena:
+            if offset in omitir:
+                offset += limite
+                continue
+            
+            data = self.descargar_pagina(offset)
+            
+            if not data or len(data) == 0:
+                break
+            
+            yield offset, data
+            
+            ultima_llena = len(data) >= limite
+            offset += limite
+    
+    def descargar_exportacion_csv(self):
+        """
+        Descargar la exportación CSV del recurso a disco por bloques.
+        Si existe una descarga interrumpida de la misma consulta se reanuda con Range.
+        """
+        params = self.parametros_consulta()
+        params['$limit'] = 2**31 - 1  # Sin paginación: todo el recurso en una respuesta
+        
+        url_csv = self.api_url.rsplit('.', 1)[0] + '.csv'
+        recurso = os.path.basename(url_csv).rsplit('.', 1)[0]
+        clave = hashlib.md5(f"{url_csv}{sorted(params.items())}".encode()).hexdigest()[:12]
+        
+        os.makedirs(self.directorio_descargas, exist_ok=True)
+        ruta = os.path.join(self.directorio_descargas, f"{recurso}_{clave}.csv")
+        ruta_parcial = ruta + '.part'
+        
+        # Exportación completa que quedó de una ejecución interrumpida
+        if os.path.exists(ruta):
+            logging.info(f"[INFO] Reutilizando exportación CSV ya descargada: {ruta}")
+            return ruta
+        
+        for intento in range(self.reintentos + 1):
+            try:
+                descargados = self.descargar_csv_parcial(url_csv, params, ruta_parcial)
+                break
+            except ERRORES_RED as e:
+                # Un corte a mitad de la descarga se reanuda desde lo ya escrito
+                if intento >= self.reintentos:
+                    raise
+                espera = self.calcular_espera_reintento(intento)
+                logging.warning(f"⚠️  Descarga CSV interrumpida ({e}), reintento {intento + 1}/{self.reintentos} en {espera:.1f}s")
+                time.sleep(espera)
+        
+        os.replace(ruta_parcial, ruta)
+        logging.info(f"[SUCCESS] Exportación CSV descargada: {ruta} ({descargados / (1024 * 1024):.1f} MB)")
+        return ruta
+    
+    def descargar_csv_parcial(self, url_csv, params, ruta_parcial):
+        """
+        Escribir la exportación CSV en ruta_parcial continuando lo ya descargado.
+        Retorna el tamaño final del archivo.
+        """
+        headers = {}
+        descargados = 0
+        if os.path.exists(ruta_parcial):
+            descargados = os.path.getsize(ruta_parcial)
+            headers['Range'] = f"bytes={descargados}-"
+            # Los rangos se cuentan sobre el contenido sin comprimir
+            headers['Accept-Encoding'] = 'identity'
+            logging.info(f"[INFO] Reanudando descarga CSV desde el byte {descargados}")
+        
+        with self.peticion_get(url_csv, params=params, headers=headers, stream=True) as response:
+            if response.status_code == 416:
+                # El archivo parcial ya estaba completo
+                return descargados
+            
+            response.raise_for_status()
+            
+            # Si el servidor ignora el Range se descarga de nuevo desde el inicio
+            if response.status_code != 206:
+                descargados = 0
+            
+            with open(ruta_parcial, 'ab' if descargados else 'wb') as archivo:
+                siguiente_reporte = descargados + 50 * 1024 * 1024
+                for bloque in response.iter_content(chunk_size=1024 * 1024):
+                    archivo.write(bloque)
+                    descargados += len(bloque)
+                    
+                    if descargados >= siguiente_reporte:
+                        logging.info(f"[INFO] Descargados {descargados / (1024 * 1024):.0f} MB del CSV")
+                        siguiente_reporte += 50 * 1024 * 1024
+        
+        return descargados
+    
+    def iterar_bloques_csv(self, omitir=()):
         """
-        Conectar a MySQL (XAMPP)
+        Generar (fila inicial, DataFrame) leyendo la exportación CSV por bloques.
+        Los bloques cuya fila inicial está en omitir (ya cargados) se saltan.
         """
-        try:
-            self.conexion = mysql.connector.connect(
-                host='localhost',
-                user='root',
-                password='',
-                port=3306,
-                database='morbilidad_urgencias',
-                autocommit=False
-            )
-            logging.info("[SUCCESS] Conexión a MySQL exitosa")
-            return True
-        except mysql.connector.Error as e:
-            logging.error(f"[ERROR] Error conectando a MySQL: {e}")
-            return False
+        ruta = self.descargar_exportacion_csv()
+        
+        # Todo como texto, igual que el JSON de la API; solo las celdas vacías son nulas
+        lector = pd.read_csv(ruta, dtype=str, keep_default_na=False, na_values=[''],
+                             chunksize=self.filas_por_bloque_csv)
+        
+        fila = 0
+        with lector:
+            for bloque in lector:
+                inicio = fila
+                fila += len(bloque)
+                if inicio in omitir:
+                    continue
+                
+                bloque.columns = bloque.columns.str.strip()
+                yield inicio, bloque
+                logging.info(f"[INFO] Leídos {len(bloque)} registros del CSV. Total: {fila}")
+        
+        # Se conserva si la ejecución se interrumpe, para reanudarla sin descargar de nuevo
+        os.remove(ruta)
+    
+    def iterar_paginas(self, omitir=()):
+        """
+        Generar (offset, página) desde la caché local en modo offline, o desde la API
+        guardando cada página en la caché si está activa
+        """
+        if self.ejecucion_offline:
+            yield from self.cache.iterar_paginas(self.ejecucion_offline, omitir)
+            return
+        
+        if self.id_ejecucion is None:
+            self.id_ejecucion = datetime.now().strftime('%Y%m%d%H%M%S')
+        
+        for offset, data in self.iterar_paginas_api(omitir):
+            if self.guardar_en_cache:
+                self.cache.guardar_pagina(self.id_ejecucion, offset, data)
+            yield offset, data
+    
+    def iterar_lotes(self, omitir=()):
+        """
+        Agrupar las páginas descargadas en lotes de paginas_por_lote páginas.
+        En modo CSV cada bloque leído de la exportación es un lote.
+        """
+        if self.modo_descarga == 'csv' and not self.ejecucion_offline:
+            for fila, bloque in self.iterar_bloques_csv(omitir):
+                yield [fila], bloque
+            return
+        
+        offsets = []
+        datos = []
+        total = 0
+        
+        for offset, data in self.iterar_paginas(omitir):
+            offsets.append(offset)
+            datos.extend(data)
+            total += len(data)
+            logging.info(f"[INFO] Obtenidos {len(data)} registros. Total: {total}")
+            
+            if len(offsets) >= self.paginas_por_lote:
+                yield offsets, datos
+                offsets = []
+                datos = []
+        
+        if datos:
+            yield offsets, datos
     
     def obtener_datos_api(self):
         """
-        Obtener todos los datos de la API
+        Obtener los datos de la API descargando páginas en paralelo.
+        En modo incremental solo se piden los registros posteriores a la marca de agua.
+        Retorna None si la descarga falla.
         """
         try:
             logging.info("🔄 Obteniendo datos de la API...")
             
-            todos_los_datos = []
-            offset = 0
-            limite = 1000
+            if self.modo_descarga == 'csv' and not self.ejecucion_offline:
+                bloques = [bloque for _, bloque in self.iterar_bloques_csv()]
+                todos_los_datos = pd.concat(bloques, ignore_index=True) if bloques else []
+                logging.info(f"[SUCCESS] Total de registros obtenidos de la API: {len(todos_los_datos)}")
+                return todos_los_datos
             
-            while True:
-                params = {
-                    '$limit': limite,
-                    '$offset': offset
-                }
-                
-                response = requests.get(self.api_url, params=params, timeout=30)
-                response.raise_for_status()
-                
-                data = response.json()
-                
-                if not data or len(data) == 0:
-                    break
-                
+            todos_los_datos = []
+            for _, data in self.iterar_paginas():
                 todos_los_datos.extend(data)
                 logging.info(f"[INFO] Obtenidos {len(data)} registros. Total: {len(todos_los_datos)}")
-                
-                if len(data) < limite:
-                    break
-                
-                offset += limite
-                time.sleep(0.5)  # Pausa para no sobrecargar la API
             
             logging.info(f"[SUCCESS] Total de registros obtenidos de la API: {len(todos_los_datos)}")
             return todos_los_datos
             
         except Exception as e:
             logging.error(f"[ERROR] Error obteniendo datos de la API: {e}")
-            return []
+            return None
     
     def limpiar_datos(self, datos):
         """
-        Limpiar y validar los datos
+        Limpiar y validar los datos, por bloques en varios procesos si está configurado.
+        Retorna None si la limpieza falla.
         """
         try:
-            df = pd.DataFrame(datos)
-            
-            # Limpiar espacios en blanco
-            for col in df.columns:
-                if df[col].dtype == 'object':
-                    df[col] = df[col].astype(str).str.strip()
-            
-            # Validar y limpiar edad
-            df['edad'] = pd.to_numeric(df['edad'], errors='coerce')
-            df = df.dropna(subset=['edad'])
-            df = df[(df['edad'] >= 0) & (df['edad'] <= 120)]
+            if self.motor_limpieza == 'polars':
+                df, rechazos, rechazados = limpiar_bloque_polars(
+                    datos, self.reglas_validacion, bool(self.archivo_rechazados)
+                )
+            elif self.procesos_limpieza > 1 and len(datos) > 1:
+                df, rechazos, rechazados = self.limpiar_en_paralelo(datos)
+            else:
+                df, rechazos, rechazados, _ = limpiar_bloque(
+                    datos, self.normalizador, self.reglas_validacion, bool(self.archivo_rechazados)
+                )
             
-            # Validar sexo
-            df = df[df['sexo'].isin(['M', 'F'])]
+            # Representación compacta para deduplicar y mapear llaves foráneas
+            memoria_inicial = df.memory_usage(deep=True).sum()
+            df = compactar_columnas(df)
+            logging.info(f"[INFO] Memoria del lote: {memoria_inicial / 1048576:.1f} MB -> "
+                         f"{df.memory_usage(deep=True).sum() / 1048576:.1f} MB")
             
-            # Limpiar fechas
-            df['fecha_atencion'] = pd.to_datetime(df['fecha_atencion'], errors='coerce')
-            df = df.dropna(subset=['fecha_atencion'])
+            for regla, cantidad in rechazos.items():
+                self.rechazos[regla] = self.rechazos.get(regla, 0) + cantidad
+            if rechazos:
+                detalle = ', '.join(f"{regla}: {cantidad}" for regla, cantidad in rechazos.items())
+                logging.info(f"[INFO] Registros rechazados por regla - {detalle}")
+            if rechazados is not None:
+                self.guardar_rechazados(rechazados)
             
-            # Validar año
-            df['a_o'] = pd.to_numeric(df['a_o'], errors='coerce')
-            df = df[(df['a_o'] >= 2020) & (df['a_o'] <= 2025)]
+            logging.info(f"[SUCCESS] Datos limpiados: {len(df)} registros válidos")
+            return df
             
-            # Limpiar texto de diagnósticos
-            df['nombre_diagnostico'] = df['nombre_diagnostico'].str.replace(r'[^\w\s\-\.]', '', regex=True)
-            df['nombre_diagnostico'] = df['nombre_diagnostico'].str.replace(r'\s+', ' ', regex=True)
+        except Exception as e:
+            logging.error(f"[ERROR] Error limpiando datos: {e}")
+            return None
+    
+    def limpiar_en_paralelo(self, datos):
+        """
+        Limpiar los datos en un pool de procesos, repartidos en al menos un bloque por proceso
+        y de como máximo filas_por_bloque_limpieza filas. Solo hay procesos_limpieza * 2 bloques
+        en vuelo, así la memoria depende del tamaño del bloque y no del total de registros.
+        """
+        if self.pool_limpieza is None:
+            # Cada proceso parte de la caché de normalización guardada en disco.
+            # spawn y no fork: el pool se crea desde el hilo de una fuente y un fork copiaría
+            # los locks tomados por otros hilos (p. ej. el de parser_fechas) sin quien los libere
+            self.normalizador.guardar()
+            self.pool_limpieza = ProcessPoolExecutor(
+                max_workers=self.procesos_limpieza,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=iniciar_proceso_limpieza,
+                initargs=(self.normalizador.ruta, self.normalizador.max_entradas)
+            )
+        
+        tamano = min(self.filas_por_bloque_limpieza, -(-len(datos) // self.procesos_limpieza))
+        bloques = (
+            datos.iloc[inicio:inicio + tamano] if isinstance(datos, pd.DataFrame) else datos[inicio:inicio + tamano]
+            for inicio in range(0, len(datos), tamano)
+        )
+        
+        resultados = []
+        rechazos = {}
+        en_vuelo = deque()
+        
+        for bloque in bloques:
+            en_vuelo.append(self.pool_limpieza.submit(
+                limpiar_bloque, bloque, None, self.reglas_validacion, bool(self.archivo_rechazados)
+            ))
+            if len(en_vuelo) >= self.procesos_limpieza * 2:
+                resultados.append(en_vuelo.popleft().result())
+        
+        while en_vuelo:
+            resultados.append(en_vuelo.popleft().result())
+        
+        for _, rechazos_bloque, _, nuevos in resultados:
+            for regla, cantidad in rechazos_bloque.items():
+                rechazos[regla] = rechazos.get(regla, 0) + cantidad
+            self.normalizador.incorporar(nuevos)
+        
+        df = pd.concat([resultado[0] for resultado in resultados], ignore_index=True)
+        rechazados = [resultado[2] for resultado in resultados if resultado[2] is not None]
+        return df, rechazos, pd.concat(rechazados, ignore_index=True) if rechazados else None
+    
+    def guardar_rechazados(self, rechazados):
+        """
+        Agregar las filas rechazadas, con la regla que incumplen, al archivo CSV de rechazos
+        """
+        try:
+            nuevo = not os.path.exists(self.archivo_rechazados)
+            rechazados.assign(id_ejecucion=self.id_ejecucion).to_csv(
+                self.archivo_rechazados, mode='a', header=nuevo, index=False, encoding='utf-8'
+            )
+        except OSError as e:
+            logging.warning(f"⚠️  No se pudieron guardar las filas rechazadas: {e}")
+    
+    def cerrar_pool_limpieza(self):
+        if self.pool_limpieza is not None:
+            self.pool_limpieza.shutdown()
+            self.pool_limpieza = None
+    
+    def crear_tabla_hashes(self, nombre='hashes_registros'):
+        """
+        Crear tabla de hashes de registros si no existe
+        """
+        cursor = self.conexion.cursor()
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {nombre} (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                hash_registro BINARY(16) UNIQUE,
+                periodo VARCHAR(20) NOT NULL DEFAULT '',
+                fecha_insercion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                INDEX idx_periodo_hash (periodo, hash_registro)
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS metadatos_actualizador (
+                clave VARCHAR(50) PRIMARY KEY,
+                valor VARCHAR(100)
+            )
+        """)
+        self.conexion.commit()
+        cursor.close()
+    
+    def verificar_version_hashes(self):
+        """
+        Migrar hashes_registros una sola vez si fue generada con otra versión de la huella
+        """
+        try:
+            self.crear_tabla_hashes()
+            cursor = self.conexion.cursor()
             
-            # Eliminar registros con campos vacíos críticos
-            campos_criticos = ['procedencia', 'departamento', 'diagnostico', 'nombre_diagnostico', 'regimen', 'eapb']
-            for campo in campos_criticos:
-                df = df[df[campo].str.len() > 0]
+            cursor.execute("SELECT valor FROM metadatos_actualizador WHERE clave = 'version_hash'")
+            fila = cursor.fetchone()
+            version = int(fila[0]) if fila else None
+            cursor.close()
             
-            # Crear hash único para cada registro para detectar duplicados
-            df['hash_registro'] = df.apply(lambda row: hashlib.md5(
-                f"{row['periodo']}{row['a_o']}{row['sexo']}{row['edad']}{row['procedencia']}{row['departamento']}{row['fecha_atencion']}{row['diagnostico']}{row['regimen']}{row['eapb']}".encode()
-            ).hexdigest(), axis=1)
+            # Sin versión registrada la tabla puede ser nueva, de la versión 1 (md5) o tener el esquema
+            # anterior (VARCHAR(32) sin periodo) que CREATE TABLE IF NOT EXISTS no cambia: se reconstruye
+            # siempre, lo que en una instalación nueva es inmediato
+            if version != VERSION_HASH:
+                return self.migrar_hashes_registros()
             
-            logging.info(f"[SUCCESS] Datos limpiados: {len(df)} registros válidos")
-            return df
+            self.guardar_version_hashes()
+            return True
             
         except Exception as e:
-            logging.error(f"[ERROR] Error limpiando datos: {e}")
-            return pd.DataFrame()
+            logging.error(f"❌ Error verificando la versión de los hashes: {e}")
+            return False
+    
+    def guardar_version_hashes(self):
+        cursor = self.conexion.cursor()
+        cursor.execute("""
+            REPLACE INTO metadatos_actualizador (clave, valor) VALUES ('version_hash', %s)
+        """, (str(VERSION_HASH),))
+        self.conexion.commit()
+        cursor.close()
+    
+    def intercambiar_tabla_hashes(self, cursor):
+        """
+        Reemplazar hashes_registros por hashes_registros_nuevo en un solo RENAME TABLE
+        """
+        cursor.execute("""
+            RENAME TABLE hashes_registros TO hashes_registros_anterior,
+                         hashes_registros_nuevo TO hashes_registros
+        """)
+        cursor.execute("DROP TABLE hashes_registros_anterior")
+        self.conexion.commit()
     
-    def obtener_hashes_existentes(self):
+    def migrar_hashes_registros(self, filas_por_bloque=100000):
         """
-        Obtener hashes de registros ya existentes en la base de datos
+        Recalcular hashes_registros con la huella actual a partir de atenciones_urgencias.
+        
+        Los hashes md5 anteriores no se pueden convertir y las versiones 2 y 3 no guardan el
+        periodo, pero todos los campos de la huella se pueden reconstruir uniendo la atención
+        con sus tablas maestras. Se llena una tabla nueva por bloques y se intercambia con
+        RENAME TABLE, así la tabla vigente nunca queda a medias.
+        
+        Cada bloque se lee completo por rango de id_atencion antes de escribirlo: la conexión
+        no admite otra sentencia mientras queda un resultado sin leer.
+        
+        Se ejecuta sola la primera vez que corre una versión nueva de la huella, o a mano con:
+        python actualizador_automatico.py migrar-hashes
         """
         try:
+            logging.info(f"🔄 Migrando hashes_registros a la versión {VERSION_HASH} de la huella...")
             cursor = self.conexion.cursor()
             
-            # Crear tabla de hashes si no existe
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS hashes_registros (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    hash_registro VARCHAR(32) UNIQUE,
-                    fecha_insercion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            cursor.execute("DROP TABLE IF EXISTS hashes_registros_nuevo")
+            self.crear_tabla_hashes('hashes_registros_nuevo')
+            
+            migrados = 0
+            ultimo_id = 0
+            while True:
+                cursor.execute("""
+                    SELECT a.id_atencion, a.periodo, a.año, a.sexo, a.edad, m.nombre_municipio,
+                           d.nombre_departamento, a.fecha_atencion, dg.codigo_diagnostico,
+                           r.nombre_regimen, e.nombre_eapb
+                    FROM atenciones_urgencias a
+                    JOIN municipios m ON m.id_municipio = a.id_municipio
+                    JOIN departamentos d ON d.id_departamento = m.id_departamento
+                    JOIN diagnosticos dg ON dg.id_diagnostico = a.id_diagnostico
+                    JOIN regimenes_salud r ON r.id_regimen = a.id_regimen
+                    JOIN eapb e ON e.id_eapb = a.id_eapb
+                    WHERE a.id_atencion > %s
+                    ORDER BY a.id_atencion
+                    LIMIT %s
+                """, (ultimo_id, filas_por_bloque))
+                filas = cursor.fetchall()
+                if not filas:
+                    break
+                
+                ultimo_id = filas[-1][0]
+                bloque = pd.DataFrame([fila[1:] for fila in filas], columns=COLUMNAS_HUELLA)
+                cursor.executemany(
+                    "INSERT IGNORE INTO hashes_registros_nuevo (hash_registro, periodo) VALUES (%s, %s)",
+                    list(zip(huellas_a_binario(*calcular_huellas(bloque)), clave_periodo(bloque)))
                 )
-            """)
+                migrados += len(filas)
+                logging.info(f"[INFO] Hashes migrados: {migrados}")
+            
+            self.intercambiar_tabla_hashes(cursor)
+            cursor.close()
+            
+            self.guardar_version_hashes()
+            logging.info(f"✅ Migración de hashes completada: {migrados} registros")
+            return True
             
-            # Obtener todos los hashes existentes
-            cursor.execute("SELECT hash_registro FROM hashes_registros")
-            hashes_existentes = set(row[0] for row in cursor.fetchall())
+        except Exception as e:
+            logging.error(f"❌ Error migrando hashes_registros: {e}")
+            self.conexion.rollback()
+            return False
+    
+    def obtener_hashes_existentes(self, periodos, filas_por_bloque=500000):
+        """
+        Obtener los hashes ya existentes en la base de datos de los periodos indicados,
+        como {periodo: IndiceHuellas}
+        """
+        try:
+            cursor = self.conexion.cursor()
+            marcadores = ', '.join(['%s'] * len(periodos))
+            cursor.execute(f"SELECT periodo, hash_registro FROM hashes_registros WHERE periodo IN ({marcadores})",
+                           tuple(periodos))
             
+            # Leer por bloques de 16 bytes por registro
+            leidos = {periodo: ([], []) for periodo in periodos}
+            while True:
+                filas = cursor.fetchmany(filas_por_bloque)
+                if not filas:
+                    break
+                bloque = pd.DataFrame(filas, columns=['periodo', 'hash_registro'])
+                for periodo, grupo in bloque.groupby('periodo', sort=False):
+                    alto, bajo = binario_a_huellas([bytes(valor) for valor in grupo['hash_registro']])
+                    leidos[periodo][0].append(alto)
+                    leidos[periodo][1].append(bajo)
             cursor.close()
-            logging.info(f"[INFO] Hashes existentes en BD: {len(hashes_existentes)}")
-            return hashes_existentes
+            
+            particiones = {
+                periodo: IndiceHuellas(np.concatenate(altos), np.concatenate(bajos)) if altos else IndiceHuellas()
+                for periodo, (altos, bajos) in leidos.items()
+            }
+            logging.info(f"[INFO] Hashes existentes en BD para {len(periodos)} periodos: "
+                         f"{sum(len(indice) for indice in particiones.values())}")
+            return particiones
             
         except Exception as e:
             logging.error(f"[ERROR] Error obteniendo hashes existentes: {e}")
-            return set()
+            raise
+    
+    def hashes_nuevos_en_bd(self, hashes):
+        """
+        Cargar los hashes del lote en una tabla temporal y obtener con un anti-join
+        los que no están en hashes_registros; el historial no sale de la base de datos
+        """
+        cursor = self.conexion.cursor()
+        cursor.execute("""
+            CREATE TEMPORARY TABLE IF NOT EXISTS staging_hashes (
+                hash_registro BINARY(16) PRIMARY KEY
+            )
+        """)
+        cursor.execute("DELETE FROM staging_hashes")
+        cursor.executemany(
+            "INSERT IGNORE INTO staging_hashes (hash_registro) VALUES (%s)",
+            [(valor,) for valor in set(hashes)]
+        )
+        cursor.execute("""
+            SELECT s.hash_registro
+            FROM staging_hashes s
+            LEFT JOIN hashes_registros h ON h.hash_registro = s.hash_registro
+            WHERE h.hash_registro IS NULL
+        """)
+        nuevos = set(bytes(row[0]) for row in cursor.fetchall())
+        cursor.close()
+        return nuevos
+    
+    def actualizar_filtro_bloom(self, filas_por_bloque=500000):
+        """
+        Agregar al filtro de Bloom los hashes insertados después del último id leído
+        (por esta u otra ejecución).
+        
+        Los ids AUTO_INCREMENT no se confirman en orden: con escritores concurrentes (fuentes,
+        backfill) una transacción con ids menores puede confirmarse después de otra con ids
+        mayores. Los ids saltados al leer quedan como huecos y en cada puesta al día se buscan
+        solo esos ids; un hueco se da por definitivo (rollback, id consumido por INSERT IGNORE)
+        cuando lleva más de bloom_rescan_minutes sin aparecer.
+        """
+        cursor = self.conexion.cursor()
+        
+        # Si hashes_registros se reconstruyó (migración), sus ids vuelven a empezar
+        cursor.execute("SELECT MAX(id), NOW() FROM hashes_registros")
+        id_maximo, ahora = cursor.fetchone()
+        if (id_maximo or 0) < self.filtro_bloom.id_maximo:
+            logging.warning("⚠️  hashes_registros fue reconstruida, se reconstruye el filtro de Bloom")
+            self.filtro_bloom.abrir(reiniciar=True)
+        ahora = pd.Timestamp(ahora)
+        limite = ahora - timedelta(minutes=self.minutos_relectura_bloom)
+        
+        # Huecos pendientes: los confirmados desde la última vez se agregan, los vencidos se descartan
+        huecos = dict(self.filtro_bloom.huecos)
+        pendientes = sorted(huecos)
+        for inicio in range(0, len(pendientes), 1000):
+            grupo = pendientes[inicio:inicio + 1000]
+            cursor.execute(
+                f"SELECT id, hash_registro FROM hashes_registros WHERE id IN ({', '.join(['%s'] * len(grupo))})",
+                grupo
+            )
+            filas = cursor.fetchall()
+            if filas:
+                for fila in filas:
+                    del huecos[fila[0]]
+                alto, bajo = binario_a_huellas([bytes(row[1]) for row in filas])
+                self.filtro_bloom.agregar(alto, bajo, self.filtro_bloom.id_maximo, huecos)
+        
+        huecos = {id_hueco: detectado for id_hueco, detectado in huecos.items() if pd.Timestamp(detectado) >= limite}
+        if huecos.keys() != self.filtro_bloom.huecos.keys():
+            self.filtro_bloom.guardar_huecos(huecos)
+        
+        # Filas nuevas: los ids que no siguen al anterior dejan huecos
+        ultimo_id = self.filtro_bloom.id_maximo
+        cursor.execute("SELECT id, hash_registro FROM hashes_registros WHERE id > %s ORDER BY id", (ultimo_id,))
+        while True:
+            filas = cursor.fetchmany(filas_por_bloque)
+            if not filas:
+                break
+            
+            ids = np.array([row[0] for row in filas], dtype=np.int64)
+            esperados = np.concatenate(([ultimo_id], ids[:-1])) + 1
+            for desde, hasta in zip(esperados[ids != esperados], ids[ids != esperados]):
+                huecos.update(dict.fromkeys(range(int(desde), int(hasta)), str(ahora)))
+            ultimo_id = int(ids[-1])
+            
+            alto, bajo = binario_a_huellas([bytes(row[1]) for row in filas])
+            self.filtro_bloom.agregar(alto, bajo, ultimo_id, huecos)
+        cursor.close()
     
     def identificar_datos_nuevos(self, df, hashes_existentes):
         """
-        Identificar datos nuevos que no existen en la base de datos
+        Identificar datos nuevos que no existen en la base de datos.
+        Retorna None si la verificación falla.
         """
         try:
             # Filtrar solo registros nuevos
-            df_nuevos = df[~df['hash_registro'].isin(hashes_existentes)]
+            if self.modo_deduplicacion == 'database':
+                # Con filtro de Bloom solo se consultan en la base de datos las huellas quizás vistas
+                if self.filtro_bloom is not None:
+                    self.actualizar_filtro_bloom()
+                    quizas_vistos = self.filtro_bloom.contiene(df['hash_alto'].to_numpy(), df['hash_bajo'].to_numpy())
+                else:
+                    quizas_vistos = np.ones(len(df), dtype=bool)
+                
+                binarios = huellas_a_binario(df['hash_alto'].to_numpy()[quizas_vistos], df['hash_bajo'].to_numpy()[quizas_vistos])
+                nuevos = self.hashes_nuevos_en_bd(binarios) if binarios else set()
+                es_nuevo = ~quizas_vistos
+                es_nuevo[quizas_vistos] = np.fromiter((valor in nuevos for valor in binarios), dtype=bool, count=len(binarios))
+                df_nuevos = df[es_nuevo]
+                
+                if self.filtro_bloom is not None:
+                    logging.info(f"[INFO] Filtro de Bloom: {len(binarios)} de {len(df)} registros verificados en BD")
+            else:
+                df_nuevos = df[~hashes_existentes.contiene(
+                    clave_periodo(df), df['hash_alto'].to_numpy(), df['hash_bajo'].to_numpy()
+                )]
             
             logging.info(f"[NEW] Datos nuevos identificados: {len(df_nuevos)} de {len(df)} total")
             return df_nuevos
             
         except Exception as e:
             logging.error(f"[ERROR] Error identificando datos nuevos: {e}")
-            return pd.DataFrame()
+            return None
     
     def actualizar_tablas_maestras(self, df_nuevos):
         """
-        Actualizar tablas maestras con datos nuevos
+        Actualizar tablas maestras con datos nuevos: un INSERT IGNORE de varias filas por tabla
         """
         try:
+            # Solo se envían los valores que aún no están en la caché de dimensiones
+            self.dimensiones.sincronizar(self.conexion)
             cursor = self.conexion.cursor()
             
+            def valores_unicos(columnas, tabla=None):
+                unicos = df_nuevos[columnas].astype(object).dropna().drop_duplicates()
+                for col in columnas:
+                    unicos[col] = unicos[col].astype(str).str.strip()
+                    unicos = unicos[unicos[col].str.len() > 0]
+                valores = list(unicos.itertuples(index=False, name=None))
+                if tabla is not None:
+                    existentes = self.dimensiones.mapa(tabla)
+                    valores = [valor for valor in valores if valor[0] not in existentes]
+                return valores
+            
+            departamentos_map = self.dimensiones.mapa('departamentos')
+            municipios_map = self.dimensiones.mapa('municipios')
+            
             # 1. Actualizar departamentos
-            departamentos_nuevos = df_nuevos[['departamento']].drop_duplicates()
-            for _, row in departamentos_nuevos.iterrows():
-                nombre = row['departamento'].strip()
-                if len(nombre) > 0:
-                    cursor.execute("""
-                        INSERT IGNORE INTO departamentos (nombre_departamento, region, poblacion_estimada)
-                        VALUES (%s, %s, %s)
-                    """, (nombre, 'Colombia', None))
-            
-            # 2. Actualizar municipios
-            municipios_nuevos = df_nuevos[['procedencia', 'departamento']].drop_duplicates()
-            for _, row in municipios_nuevos.iterrows():
-                procedencia = row['procedencia'].strip()
-                departamento = row['departamento'].strip()
-                
-                if len(procedencia) > 0 and len(departamento) > 0:
-                    cursor.execute("SELECT id_departamento FROM departamentos WHERE nombre_departamento = %s", 
-                                 (departamento,))
-                    dept_id = cursor.fetchone()
-                    
-                    if dept_id:
-                        cursor.execute("""
-                            INSERT IGNORE INTO municipios (nombre_municipio, id_departamento, tipo_municipio)
-                            VALUES (%s, %s, %s)
-                        """, (procedencia, dept_id[0], 'Municipio'))
+            cursor.executemany("""
+                INSERT IGNORE INTO departamentos (nombre_departamento, region, poblacion_estimada)
+                VALUES (%s, %s, %s)
+            """, [(nombre, 'Colombia', None) for nombre, in valores_unicos(['departamento'], 'departamentos')])
+            
+            # 2. Actualizar municipios: el id del departamento se resuelve con un solo INSERT ... SELECT
+            cursor.execute("""
+                CREATE TEMPORARY TABLE IF NOT EXISTS staging_municipios (
+                    nombre_municipio VARCHAR(100) NOT NULL,
+                    nombre_departamento VARCHAR(100) NOT NULL
+                )
+            """)
+            cursor.execute("DELETE FROM staging_municipios")
+            cursor.executemany("""
+                INSERT INTO staging_municipios (nombre_municipio, nombre_departamento)
+                VALUES (%s, %s)
+            """, [
+                (municipio, departamento) for municipio, departamento in valores_unicos(['procedencia', 'departamento'])
+                if (municipio, departamentos_map.get(departamento)) not in municipios_map
+            ])
+            cursor.execute("""
+                INSERT IGNORE INTO municipios (nombre_municipio, id_departamento, tipo_municipio)
+                SELECT s.nombre_municipio, d.id_departamento, 'Municipio'
+                FROM staging_municipios s
+                JOIN departamentos d ON d.nombre_departamento = s.nombre_departamento
+            """)
             
             # 3. Actualizar diagnósticos
-            diagnosticos_nuevos = df_nuevos[['diagnostico', 'nombre_diagnostico']].drop_duplicates()
-            for _, row in diagnosticos_nuevos.iterrows():
-                codigo = row['diagnostico'].strip()
-                nombre = row['nombre_diagnostico'].strip()
-                
-                if len(codigo) > 0 and len(nombre) > 0:
-                    categoria = 'Urgencias'
-                    if codigo.startswith('R'):
-                        categoria = 'Síntomas y signos'
-                    elif codigo.startswith('S') or codigo.startswith('T'):
-                        categoria = 'Traumatismos'
-                    elif codigo.startswith('V') or codigo.startswith('W'):
-                        categoria = 'Causas externas'
-                    elif codigo.startswith('M'):
-                        categoria = 'Sistema musculoesquelético'
-                    
-                    cursor.execute("""
-                        INSERT IGNORE INTO diagnosticos (codigo_diagnostico, nombre_diagnostico, categoria_diagnostico)
-                        VALUES (%s, %s, %s)
-                    """, (codigo, nombre, categoria))
+            cursor.executemany("""
+                INSERT IGNORE INTO diagnosticos (codigo_diagnostico, nombre_diagnostico, categoria_diagnostico)
+                VALUES (%s, %s, %s)
+            """, [
+                (codigo, nombre, categoria_diagnostico(codigo))
+                for codigo, nombre in valores_unicos(['diagnostico', 'nombre_diagnostico'], 'diagnosticos')
+            ])
             
             # 4. Actualizar regímenes
-            regimenes_nuevos = df_nuevos[['regimen']].drop_duplicates()
-            for _, row in regimenes_nuevos.iterrows():
-                regimen = row['regimen'].strip()
-                
-                if len(regimen) > 0:
-                    tipo_regimen = 'Público'
-                    if regimen in ['CONTRIBUTIVO', 'PARTICULAR']:
-                        tipo_regimen = 'Privado'
-                    elif regimen in ['VINCULADO', 'OTRO']:
-                        tipo_regimen = 'Especial'
-                    
-                    cursor.execute("""
-                        INSERT IGNORE INTO regimenes_salud (nombre_regimen, tipo_regimen, descripcion)
-                        VALUES (%s, %s, %s)
-                    """, (regimen, tipo_regimen, f'Régimen de salud {regimen}'))
+            cursor.executemany("""
+                INSERT IGNORE INTO regimenes_salud (nombre_regimen, tipo_regimen, descripcion)
+                VALUES (%s, %s, %s)
+            """, [
+                (regimen, tipo_regimen(regimen), f'Régimen de salud {regimen}')
+                for regimen, in valores_unicos(['regimen'], 'regimenes_salud')
+            ])
             
             # 5. Actualizar EAPB
-            eapb_nuevos = df_nuevos[['eapb']].drop_duplicates()
-            for _, row in eapb_nuevos.iterrows():
-                eapb = row['eapb'].strip()
-                
-                if len(eapb) > 0:
-                    tipo_entidad = 'EAPB'
-                    if 'EPS' in eapb.upper():
-                        tipo_entidad = 'EPS'
-                    elif 'ARS' in eapb.upper():
-                        tipo_entidad = 'ARS'
-                    elif 'VINCULADOS' in eapb.upper():
-                        tipo_entidad = 'Vinculados'
-                    
-                    cursor.execute("""
-                        INSERT IGNORE INTO eapb (nombre_eapb, tipo_entidad)
-                        VALUES (%s, %s)
-                    """, (eapb, tipo_entidad))
+            cursor.executemany("""
+                INSERT IGNORE INTO eapb (nombre_eapb, tipo_entidad)
+                VALUES (%s, %s)
+            """, [(eapb, tipo_entidad_eapb(eapb)) for eapb, in valores_unicos(['eapb'], 'eapb')])
             
             self.conexion.commit()
             cursor.close()
@@ -280,52 +2173,68 @@ class ActualizadorMorbilidad:
     
     def insertar_atenciones_nuevas(self, df_nuevos):
         """
-        Insertar nuevas atenciones en la tabla principal
+        Insertar nuevas atenciones en la tabla principal.
+        Retorna None si la inserción falla.
         """
         try:
-            cursor = self.conexion.cursor()
+            # Mapeos de IDs desde la caché de dimensiones (solo lee las filas nuevas)
+            self.dimensiones.sincronizar(self.conexion)
             
-            # Crear mapeos de IDs
-            cursor.execute("SELECT id_municipio, nombre_municipio FROM municipios")
-            municipios_map = {row[1]: row[0] for row in cursor.fetchall()}
+            # Llaves foráneas por columna: el municipio se resuelve por su llave única
+            # (nombre, departamento), así los municipios homónimos de distintos departamentos
+            # no se confunden; las demás con mapear_ids (una búsqueda por categoría)
+            ids = df_nuevos[['procedencia', 'departamento']].astype(object).join(
+                self.dimensiones.tabla_municipios(), on=['procedencia', 'departamento']
+            )
+            ids['id_diagnostico'] = mapear_ids(df_nuevos['diagnostico'], self.dimensiones.mapa('diagnosticos'))
+            ids['id_regimen'] = mapear_ids(df_nuevos['regimen'], self.dimensiones.mapa('regimenes_salud'))
+            ids['id_eapb'] = mapear_ids(df_nuevos['eapb'], self.dimensiones.mapa('eapb'))
             
-            cursor.execute("SELECT id_diagnostico, codigo_diagnostico FROM diagnosticos")
-            diagnosticos_map = {row[1]: row[0] for row in cursor.fetchall()}
+            columnas_fk = {'id_municipio': 'municipio', 'id_diagnostico': 'diagnostico',
+                           'id_regimen': 'regimen', 'id_eapb': 'eapb'}
+            resueltos = ids[list(columnas_fk)].notna().all(axis=1).to_numpy()
             
-            cursor.execute("SELECT id_regimen, nombre_regimen FROM regimenes_salud")
-            regimenes_map = {row[1]: row[0] for row in cursor.fetchall()}
+            # Reporte agregado de los registros que no se pudieron resolver
+            if not resueltos.all():
+                detalle = []
+                for columna, nombre in columnas_fk.items():
+                    faltantes = ids[columna].isna().to_numpy()
+                    if faltantes.any():
+                        campos = ['procedencia', 'departamento'] if columna == 'id_municipio' else [nombre]
+                        ejemplos = df_nuevos.loc[faltantes, campos].astype(str).agg('/'.join, axis=1).value_counts().head(3)
+                        detalle.append(f"{nombre}: {int(faltantes.sum())} ({', '.join(ejemplos.index)})")
+                logging.warning(f"⚠️  {int((~resueltos).sum())} registros sin llaves foráneas resueltas - {'; '.join(detalle)}")
             
-            cursor.execute("SELECT id_eapb, nombre_eapb FROM eapb")
-            eapb_map = {row[1]: row[0] for row in cursor.fetchall()}
+            # Parámetros de la inserción armados por columna
+            filas = df_nuevos[resueltos]
+            ids = ids[resueltos]
             
-            # Insertar atenciones nuevas
-            insertados = 0
-            batch_data = []
+            def columna_objetos(serie):
+                return serie.astype(object).where(serie.notna(), None).tolist()
             
-            for _, row in df_nuevos.iterrows():
-                try:
-                    municipio_id = municipios_map.get(row['procedencia'])
-                    diagnostico_id = diagnosticos_map.get(row['diagnostico'])
-                    regimen_id = regimenes_map.get(row['regimen'])
-                    eapb_id = eapb_map.get(row['eapb'])
-                    
-                    if all([municipio_id, diagnostico_id, regimen_id, eapb_id]):
-                        batch_data.append((
-                            row['periodo'], int(row['a_o']), row['sexo'], int(row['edad']), 
-                            row['tipo_edad'], municipio_id, diagnostico_id, 
-                            regimen_id, eapb_id, row['fecha_atencion']
-                        ))
-                        insertados += 1
-                        
-                        # Insertar hash del registro
-                        cursor.execute("""
-                            INSERT IGNORE INTO hashes_registros (hash_registro)
-                            VALUES (%s)
-                        """, (row['hash_registro'],))
-                
-                except Exception as e:
-                    logging.warning(f"⚠️  Error procesando registro: {e}")
-                    continue
+            batch_data = list(zip(
+                columna_objetos(filas['periodo']),
+                filas['a_o'].to_numpy(dtype=np.int64).tolist(),
+                columna_objetos(filas['sexo']),
+                filas['edad'].to_numpy(dtype=np.int64).tolist(),
+                columna_objetos(filas['tipo_edad']),
+                *(ids[columna].to_numpy(dtype=np.int64).tolist() for columna in columnas_fk),
+                filas['fecha_atencion'].astype(object).tolist()
+            ))
+            # Sin repetidos: un INSERT IGNORE ignorado igual consume un id AUTO_INCREMENT
+            hashes_data = list(dict.fromkeys(zip(
+                huellas_a_binario(filas['hash_alto'].to_numpy(), filas['hash_bajo'].to_numpy()),
+                clave_periodo(filas)
+            )))
+            insertados = len(batch_data)
+            
+            cursor = self.conexion.cursor()
+            
+            if hashes_data:
+                cursor.executemany("""
+                    INSERT IGNORE INTO hashes_registros (hash_registro, periodo)
+                    VALUES (%s, %s)
+                """, hashes_data)
             
             # Insertar atenciones en lote
             if batch_data:
@@ -340,12 +2249,17 @@ class ActualizadorMorbilidad:
             self.conexion.commit()
             cursor.close()
             
+            # El filtro de Bloom incorpora los hashes recién confirmados
+            if self.filtro_bloom is not None:
+                self.actualizar_filtro_bloom()
+            
             logging.info(f"✅ {insertados} atenciones nuevas insertadas")
             return insertados
             
         except Exception as e:
             logging.error(f"❌ Error insertando atenciones nuevas: {e}")
-            return 0
+            self.conexion.rollback()
+            return None
     
     def actualizar_estadisticas(self):
         """
@@ -406,59 +2320,180 @@ class ActualizadorMorbilidad:
         except Exception as e:
             logging.error(f"❌ Error creando tabla estadísticas: {e}")
     
+    def procesar_lote(self, datos, hashes_existentes, marca_agua=None):
+        """
+        Limpiar, deduplicar y cargar un lote de registros de la API.
+        Retorna (registros válidos, registros insertados, marca de agua tras el lote)
+        o None si la carga falla.
+        """
+        # Limpiar datos
+        df_limpio = self.limpiar_datos(datos)
+        if df_limpio is None:
+            # Sin cargar el lote no se registra en el checkpoint ni avanza la marca de agua
+            return None
+        if df_limpio.empty:
+            logging.warning("⚠️  El lote no tiene datos válidos")
+            return 0, 0, marca_agua
+        
+        # La marca de agua avanza solo con registros que pasaron la validación
+        if self.modo_incremental:
+            marca_agua = self.calcular_marca_agua(df_limpio, marca_agua)
+        
+        # Identificar datos nuevos
+        df_nuevos = self.identificar_datos_nuevos(df_limpio, hashes_existentes)
+        if df_nuevos is None:
+            return None
+        if df_nuevos.empty:
+            return len(df_limpio), 0, marca_agua
+        
+        # Actualizar tablas maestras
+        if not self.actualizar_tablas_maestras(df_nuevos):
+            return None
+        
+        # Insertar atenciones nuevas
+        insertados = self.insertar_atenciones_nuevas(df_nuevos)
+        if insertados is None:
+            return None
+        
+        # Los lotes siguientes no deben volver a insertar estos registros
+        if hashes_existentes is not None:
+            hashes_existentes.agregar(
+                clave_periodo(df_nuevos), df_nuevos['hash_alto'].to_numpy(), df_nuevos['hash_bajo'].to_numpy()
+            )
+        return len(df_limpio), insertados, marca_agua
+    
+    def firma_consulta(self):
+        """
+        Identificar la consulta de la ejecución; un checkpoint solo se reanuda con la misma firma
+        """
+        return json.dumps({
+            'url': self.api_url,
+            'modo': self.modo_descarga,
+            'params': self.parametros_consulta(),
+            'tamano_pagina': self.tamano_pagina,
+            'filas_por_bloque_csv': self.filas_por_bloque_csv
+        }, sort_keys=True, default=str)
+    
     def ejecutar_actualizacion(self):
         """
         Ejecutar proceso completo de actualización
         """
         try:
-            logging.info("🚀 Iniciando actualización automática...")
+            logging.info(f"🚀 Iniciando actualización automática ({self.nombre_fuente})...")
             
             # Conectar a MySQL
             if not self.conectar_mysql():
                 return False
             
-            # Crear tabla de estadísticas si no existe
+            # Crear tablas de control si no existen
             self.crear_tabla_estadisticas()
+            self.crear_tabla_marcas_agua()
             
-            # Obtener datos de la API
-            datos_api = self.obtener_datos_api()
-            if not datos_api:
-                logging.error("❌ No se pudieron obtener datos de la API")
+            # Los hashes deben estar en la versión actual de la huella para compararse
+            if self.verificar_hashes and not self.verificar_version_hashes():
                 return False
             
-            # Limpiar datos
-            df_limpio = self.limpiar_datos(datos_api)
-            if df_limpio.empty:
-                logging.error("❌ No hay datos válidos para procesar")
-                return False
+            # Marca de agua de la última ejecución exitosa
+            if self.modo_incremental:
+                self.marca_agua = self.obtener_marca_agua()
             
-            # Obtener hashes existentes
-            hashes_existentes = self.obtener_hashes_existentes()
+            totales = {'descargados': 0, 'validos': 0, 'insertados': 0}
+            self.rechazos = {}
+            nueva_marca = self.marca_agua
+            checkpoint = self.checkpoint if self.modo_streaming else None
+            omitir = set()
             
-            # Identificar datos nuevos
-            df_nuevos = self.identificar_datos_nuevos(df_limpio, hashes_existentes)
+            if checkpoint and checkpoint.iniciar(self.firma_consulta()):
+                # Reanudar una ejecución interrumpida desde el último lote confirmado
+                omitir = checkpoint.offsets_completados()
+                totales.update(checkpoint.estado['totales'])
+                if checkpoint.estado['marca_agua']:
+                    nueva_marca = datetime.fromisoformat(checkpoint.estado['marca_agua'])
+                logging.info(f"[INFO] Reanudando ejecución {checkpoint.estado['id_ejecucion']}: "
+                             f"{checkpoint.estado['lotes']} lotes ya cargados")
             
-            if df_nuevos.empty:
-                logging.info("[SUCCESS] No hay datos nuevos para actualizar")
+            # Una ejecución reanudada sigue guardando páginas en la misma carpeta de la caché
+            self.id_ejecucion = checkpoint.estado['id_ejecucion'] if checkpoint else datetime.now().strftime('%Y%m%d%H%M%S')
+            
+            if self.guardar_en_cache and not self.ejecucion_offline:
+                self.cache.aplicar_retencion(excluir=self.id_ejecucion)
+            
+            # Obtener datos de la API: por lotes mientras se descarga, o todo de una vez
+            if self.modo_streaming:
+                logging.info("🔄 Obteniendo y cargando datos de la API por lotes...")
+                lotes = self.iterar_lotes(omitir)
+            else:
+                datos_api = self.obtener_datos_api()
+                if datos_api is None:
+                    logging.error("❌ No se pudieron obtener datos de la API")
+                    return False
+                lotes = [(None, datos_api)] if len(datos_api) else []
+            
+            # Hashes existentes: en modo memory se cargan por periodo a medida que llegan los lotes;
+            # en modo database la comparación se hace en la base de datos
+            hashes_existentes = None if self.modo_deduplicacion == 'database' else IndicePorPeriodo(self.obtener_hashes_existentes)
+            
+            if self.modo_deduplicacion == 'database' and self.usar_filtro_bloom and self.filtro_bloom is None:
+                self.filtro_bloom = FiltroBloom(
+                    self.ruta_fuente(self.config.get('Dedup', 'bloom_file', fallback='filtro_hashes.bloom')),
+                    self.config.getint('Dedup', 'bloom_capacity', fallback=20000000),
+                    self.config.getfloat('Dedup', 'bloom_false_positive_rate', fallback=0.001)
+                )
+            
+            for offsets, datos in lotes:
+                totales['descargados'] += len(datos)
+                
+                resultado = self.procesar_lote(datos, hashes_existentes, nueva_marca)
+                if resultado is None:
+                    return False
+                
+                totales['validos'] += resultado[0]
+                totales['insertados'] += resultado[1]
+                nueva_marca = resultado[2]
+                
+                if checkpoint:
+                    checkpoint.registrar_lote(offsets, totales, nueva_marca)
+            
+            if checkpoint:
+                checkpoint.finalizar()
+            
+            self.resumen_ejecucion = dict(totales, rechazos=dict(self.rechazos))
+            
+            descargados = totales['descargados']
+            validos = totales['validos']
+            insertados = totales['insertados']
+            
+            if descargados == 0:
+                logging.info("[SUCCESS] La API no tiene registros nuevos desde la última actualización")
                 return True
             
-            # Actualizar tablas maestras
-            if not self.actualizar_tablas_maestras(df_nuevos):
+            if validos == 0:
+                logging.error("❌ No hay datos válidos para procesar")
                 return False
             
-            # Insertar atenciones nuevas
-            insertados = self.insertar_atenciones_nuevas(df_nuevos)
+            # Avanzar la marca de agua solo después de cargar los datos
+            if self.modo_incremental and nueva_marca is not None:
+                self.guardar_marca_agua(nueva_marca, descargados)
+            
+            if insertados == 0:
+                logging.info("[SUCCESS] No hay datos nuevos para actualizar")
+                return True
             
             # Actualizar estadísticas
             self.actualizar_estadisticas()
             
-            logging.info(f"🎉 Actualización completada - {insertados} registros nuevos insertados")
+            logging.info(f"🎉 Actualización completada ({self.nombre_fuente}) - {insertados} registros nuevos insertados")
             return True
             
         except Exception as e:
             logging.error(f"❌ Error en actualización: {e}")
             return False
         finally:
+            self.cerrar_pool_limpieza()
+            try:
+                self.normalizador.guardar()
+            except OSError as e:
+                logging.warning(f"⚠️  No se pudo guardar la caché de normalización: {e}")
             if self.conexion:
                 self.conexion.close()
     
@@ -468,8 +2503,8 @@ class ActualizadorMorbilidad:
         """
         logging.info("⏰ Iniciando programador de actualizaciones...")
         
-        # Programar actualización cada 24 horas
-        schedule.every(24).hours.do(self.ejecutar_actualizacion)
+        # Programar actualización según el intervalo de la fuente (24 horas por defecto)
+        schedule.every(self.intervalo_horas).hours.do(self.ejecutar_actualizacion)
         
         # Ejecutar actualización inicial
         logging.info("🔄 Ejecutando actualización inicial...")
@@ -480,10 +2515,225 @@ class ActualizadorMorbilidad:
             schedule.run_pending()
             time.sleep(60)  # Verificar cada minuto
 
+def preparar_version_hashes(config):
+    """
+    Verificar (y migrar si hace falta) la versión de los hashes una sola vez, antes de lanzar
+    varias cargas a la vez: dos migraciones simultáneas se pisarían en el RENAME TABLE
+    """
+    actualizador = ActualizadorMorbilidad(config)
+    if not actualizador.conectar_mysql():
+        return False
+    try:
+        return actualizador.verificar_version_hashes()
+    finally:
+        actualizador.conexion.close()
+
+class CoordinadorFuentes:
+    """
+    Ejecutar todas las fuentes registradas en un mismo proceso, cada una con su
+    propia programación, compartiendo el pool de conexiones HTTP
+    """
+    def __init__(self, config=None):
+        self.config = config if config is not None else cargar_configuracion()
+        fuentes = cargar_fuentes(self.config)
+        
+        # Un solo pool dimensionado para la suma de los presupuestos de concurrencia
+        self.sesion = crear_sesion_http(sum(fuente['max_peticiones'] for fuente in fuentes))
+        self.dimensiones = CacheDimensiones()
+        self.actualizadores = [
+            ActualizadorMorbilidad(self.config, fuente, self.sesion, self.dimensiones) for fuente in fuentes
+        ]
+        # La versión de los hashes se verifica una vez en iniciar_programador, no en cada fuente
+        for actualizador in self.actualizadores:
+            actualizador.verificar_hashes = False
+        
+        self.executor = ThreadPoolExecutor(max_workers=len(self.actualizadores))
+        self.en_curso = {}
+        self.lock = threading.Lock()
+    
+    def lanzar(self, actualizador):
+        """
+        Lanzar la actualización de una fuente salvo que siga en curso la anterior
+        """
+        with self.lock:
+            futuro = self.en_curso.get(actualizador.nombre_fuente)
+            if futuro is not None and not futuro.done():
+                logging.warning(f"⚠️  La fuente {actualizador.nombre_fuente} sigue en ejecución, se omite esta programación")
+                return
+            
+            self.en_curso[actualizador.nombre_fuente] = self.executor.submit(actualizador.ejecutar_actualizacion)
+    
+    def iniciar_programador(self):
+        """
+        Programar cada fuente con su intervalo y ejecutarlas concurrentemente
+        """
+        logging.info(f"⏰ Iniciando programador de actualizaciones ({len(self.actualizadores)} fuentes)...")
+        
+        if not preparar_version_hashes(self.config):
+            logging.error("❌ No se pudo verificar la versión de los hashes, no se programan las fuentes")
+            return
+        
+        for actualizador in self.actualizadores:
+            schedule.every(actualizador.intervalo_horas).hours.do(self.lanzar, actualizador)
+            logging.info(f"[INFO] Fuente {actualizador.nombre_fuente}: {actualizador.api_url} "
+                         f"cada {actualizador.intervalo_horas:g} horas")
+        
+        # Ejecutar actualización inicial de todas las fuentes
+        logging.info("🔄 Ejecutando actualización inicial...")
+        for actualizador in self.actualizadores:
+            self.lanzar(actualizador)
+        
+        # Mantener el programador ejecutándose
+        while True:
+            schedule.run_pending()
+            time.sleep(60)  # Verificar cada minuto
+
+def ejecutar_particion_backfill(nombre, condicion, peticiones_por_segundo):
+    """
+    Cargar una partición del backfill en un proceso propio, con su propio checkpoint
+    """
+    actualizador = ActualizadorMorbilidad()
+    actualizador.filtros_adicionales = [condicion]
+    actualizador.modo_incremental = False
+    actualizador.modo_streaming = True
+    actualizador.limitador = LimitadorTasa(peticiones_por_segundo)
+    # Las particiones corren en paralelo y sus offsets chocarían en la misma carpeta de caché
+    actualizador.guardar_en_cache = False
+    # Cada partición ya es un proceso: limpiar dentro de él sin abrir otro pool
+    actualizador.procesos_limpieza = 1
+    # Varios procesos escribiendo el mismo archivo del filtro de Bloom perderían bits
+    actualizador.usar_filtro_bloom = False
+    # La migración de hashes ya se hizo en ejecutar_backfill (preparar_version_hashes)
+    actualizador.verificar_hashes = False
+    
+    ruta_checkpoint = actualizador.config.get('Checkpoint', 'file', fallback='checkpoint_ingesta.json')
+    directorio = os.path.dirname(ruta_checkpoint)
+    actualizador.checkpoint = CheckpointIngesta(os.path.join(directorio, f"checkpoint_backfill_{nombre}.json"))
+    
+    inicio = time.time()
+    exito = actualizador.ejecutar_actualizacion()
+    
+    resumen = actualizador.resumen_ejecucion or {'descargados': 0, 'validos': 0, 'insertados': 0}
+    resumen.update({'particion': nombre, 'exito': exito, 'segundos': time.time() - inicio})
+    return resumen
+
+def listar_particiones_backfill(tipo, desde, hasta):
+    """
+    Armar las particiones (nombre, condición SoQL) del backfill por a_o o por periodo
+    """
+    if tipo == 'a_o':
+        return [(str(anio), f"a_o = {anio}") for anio in range(desde, hasta + 1)]
+    
+    # Un periodo por partición, consultando los periodos existentes en el rango de años
+    actualizador = ActualizadorMorbilidad()
+    response = actualizador.peticion_get(actualizador.api_url, params={
+        '$select': 'periodo',
+        '$group': 'periodo',
+        '$order': 'periodo',
+        '$where': f"a_o between {desde} and {hasta} AND periodo IS NOT NULL",
+        '$limit': 50000
+    })
+    response.raise_for_status()
+    
+    periodos = [fila['periodo'] for fila in response.json() if fila.get('periodo')]
+    return [
+        (re.sub(r'[^\w\-]', '_', periodo), "periodo = '{}'".format(periodo.replace("'", "''")))
+        for periodo in periodos
+    ]
+
+def ejecutar_backfill(tipo, desde, hasta, workers):
+    """
+    Cargar el histórico completo partido por a_o o periodo en procesos paralelos
+    """
+    config = cargar_configuracion()
+    peticiones_por_segundo = config.getfloat('API', 'requests_per_second', fallback=4)
+    
+    # Verificar (y migrar si hace falta) la versión de los hashes una sola vez, antes del pool
+    if not preparar_version_hashes(config):
+        return False
+    
+    particiones = listar_particiones_backfill(tipo, desde, hasta)
+    logging.info(f"🚀 Backfill de {len(particiones)} particiones por {tipo} ({desde}-{hasta}) con {workers} procesos")
+    
+    inicio = time.time()
+    resultados = []
+    acumulado = 0
+    
+    # El límite de peticiones por segundo se reparte entre los procesos
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futuros = {
+            executor.submit(ejecutar_particion_backfill, nombre, condicion, peticiones_por_segundo / workers): nombre
+            for nombre, condicion in particiones
+        }
+        
+        for futuro in as_completed(futuros):
+            try:
+                resultado = futuro.result()
+            except Exception as e:
+                resultado = {'particion': futuros[futuro], 'exito': False, 'descargados': 0,
+                             'validos': 0, 'insertados': 0, 'segundos': 0}
+                logging.error(f"❌ Error en la partición {futuros[futuro]}: {e}")
+            
+            resultados.append(resultado)
+            acumulado += resultado['descargados']
+            transcurrido = time.time() - inicio
+            logging.info(
+                f"[BACKFILL] {len(resultados)}/{len(particiones)} particiones - "
+                f"{resultado['particion']}: {resultado['insertados']} insertados en {resultado['segundos']:.0f}s - "
+                f"acumulado {acumulado} registros ({acumulado / max(transcurrido, 1e-9):.0f} reg/s)"
+            )
+    
+    transcurrido = time.time() - inicio
+    print("="*80)
+    print(f"{'PARTICIÓN':<15}{'ESTADO':<10}{'DESCARGADOS':>14}{'VÁLIDOS':>12}{'INSERTADOS':>12}{'REG/S':>10}")
+    for resultado in sorted(resultados, key=lambda r: r['particion']):
+        velocidad = resultado['descargados'] / resultado['segundos'] if resultado['segundos'] else 0
+        estado = 'OK' if resultado['exito'] else 'ERROR'
+        print(f"{resultado['particion']:<15}{estado:<10}{resultado['descargados']:>14}"
+              f"{resultado['validos']:>12}{resultado['insertados']:>12}{velocidad:>10.0f}")
+    
+    total_descargados = sum(r['descargados'] for r in resultados)
+    total_insertados = sum(r['insertados'] for r in resultados)
+    print("-"*80)
+    print(f"Total: {total_descargados} descargados, {total_insertados} insertados en {transcurrido:.0f}s "
+          f"({total_descargados / max(transcurrido, 1e-9):.0f} reg/s)")
+    print("="*80)
+    
+    return all(r['exito'] for r in resultados)
+
 def main():
     """
     Función principal
     """
+    parser = argparse.ArgumentParser(description="Actualizador automático de morbilidad urgencias")
+    subcomandos = parser.add_subparsers(dest='comando')
+    
+    backfill = subcomandos.add_parser('backfill', help="Cargar el histórico en paralelo por particiones")
+    regla_anio = next((regla for regla in cargar_reglas_validacion(cargar_configuracion())
+                       if regla['campo'] == 'a_o' and regla['tipo'] == 'rango'),
+                      {'minimo': 2020, 'maximo': datetime.now().year})
+    backfill.add_argument('--por', choices=['a_o', 'periodo'], default='a_o', help="Campo de partición")
+    backfill.add_argument('--desde', type=int, default=int(regla_anio['minimo']), help="Primer año")
+    backfill.add_argument('--hasta', type=int, default=int(regla_anio['maximo']), help="Último año")
+    backfill.add_argument('--workers', type=int, default=4, help="Procesos en paralelo")
+    
+    subcomandos.add_parser('migrar-hashes', help="Recalcular hashes_registros con la huella actual")
+    
+    args = parser.parse_args()
+    
+    if args.comando == 'migrar-hashes':
+        actualizador = ActualizadorMorbilidad()
+        exito = actualizador.conectar_mysql()
+        if exito:
+            actualizador.crear_tabla_hashes()
+            exito = actualizador.migrar_hashes_registros()
+            actualizador.conexion.close()
+        sys.exit(0 if exito else 1)
+    
+    if args.comando == 'backfill':
+        exito = ejecutar_backfill(args.por, args.desde, args.hasta, args.workers)
+        sys.exit(0 if exito else 1)
+    
     print("="*80)
     print("🔄 ACTUALIZADOR AUTOMÁTICO DE MORBILIDAD URGENCIAS")
     print("="*80)
@@ -492,10 +2742,10 @@ def main():
     print("📊 Mantiene estadísticas de actualización")
     print("="*80)
     
-    actualizador = ActualizadorMorbilidad()
+    coordinador = CoordinadorFuentes()
     
     try:
-        actualizador.iniciar_programador()
+        coordinador.iniciar_programador()
     except KeyboardInterrupt:
         logging.info("🛑 Actualizador detenido por el usuario")
     except Exception as e:
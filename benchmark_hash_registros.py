@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Script para comparar el cálculo de hash_registro fila por fila (md5) con el vectorizado
+"""
+
+import argparse
+import hashlib
+import time
+
+import numpy as np
+import pandas as pd
+
+from actualizador_automatico import IndiceHuellas, calcular_huellas
+
+def generar_datos(filas, semilla=1):
+    """Generar un DataFrame con la forma de los datos ya limpiados"""
+    aleatorio = np.random.default_rng(semilla)
+    años = aleatorio.integers(2019, 2026, filas)
+    
+    return pd.DataFrame({
+        'periodo': [f"{año}-{mes:02d}" for año, mes in zip(años, aleatorio.integers(1, 13, filas))],
+        'a_o': años,
+        'sexo': aleatorio.choice(['M', 'F'], filas),
+        'edad': aleatorio.integers(0, 100, filas),
+        'procedencia': aleatorio.choice(['MEDELLIN', 'BOGOTA', 'CALI', 'TUNJA', 'BELLO'], filas),
+        'departamento': aleatorio.choice(['ANTIOQUIA', 'CUNDINAMARCA', 'VALLE', 'BOYACA'], filas),
+        'fecha_atencion': pd.to_datetime('2019-01-01') + pd.to_timedelta(aleatorio.integers(0, 2500, filas), unit='D'),
+        'diagnostico': aleatorio.choice(['R10', 'S01', 'M54', 'J00', 'T14'], filas),
+        'regimen': aleatorio.choice(['CONTRIBUTIVO', 'SUBSIDIADO'], filas),
+        'eapb': aleatorio.choice(['EPS SURA', 'NUEVA EPS', 'SANITAS'], filas),
+    })
+
+def hash_fila_por_fila(df):
+    """Cálculo anterior: md5 con df.apply sobre cada fila"""
+    return df.apply(
+        lambda row: hashlib.md5(
+            f"{row['periodo']}{row['a_o']}{row['sexo']}{row['edad']}{row['procedencia']}"
+            f"{row['departamento']}{row['fecha_atencion']}{row['diagnostico']}{row['regimen']}"
+            f"{row['eapb']}".encode()
+        ).hexdigest(),
+        axis=1
+    )
+
+def medir(funcion, df):
+    inicio = time.perf_counter()
+    resultado = funcion(df)
+    return time.perf_counter() - inicio, resultado
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del cálculo de hash_registro")
+    parser.add_argument('--filas', type=int, default=200000, help="Filas sintéticas a procesar")
+    args = parser.parse_args()
+    
+    df = generar_datos(args.filas)
+    print(f"📊 Registros: {len(df)}")
+    
+    tiempo_anterior, _ = medir(hash_fila_por_fila, df)
+    print(f"🐢 md5 fila por fila: {tiempo_anterior:.2f} s")
+    
+    tiempo_nuevo, (alto, bajo) = medir(calcular_huellas, df)
+    print(f"🚀 Vectorizado:       {tiempo_nuevo:.2f} s")
+    
+    print(f"✅ Aceleración: {tiempo_anterior / tiempo_nuevo:.1f}x")
+    print(f"🔍 Hashes distintos: {len(set(zip(alto, bajo)))} de {len(alto)}")
+    
+    # Búsqueda de todo el lote en el índice ordenado de huellas existentes
+    indice = IndiceHuellas(alto[::2], bajo[::2])
+    inicio = time.perf_counter()
+    existentes = indice.contiene(alto, bajo)
+    print(f"🔎 Búsqueda en el índice ({len(indice)} huellas, {indice.alto.nbytes + indice.bajo.nbytes} bytes): "
+          f"{(time.perf_counter() - inicio) * 1000:.1f} ms, {existentes.sum()} existentes")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Script para verificar que los motores de limpieza pandas y polars producen el mismo resultado
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from actualizador_automatico import (ActualizadorMorbilidad, IndiceHuellas, IndicePorPeriodo, cargar_configuracion,
+                                     clave_periodo, pl)
+
+def generar_registros(filas, semilla=1):
+    """Generar registros crudos como los entrega la API, con valores sucios e inválidos"""
+    aleatorio = np.random.default_rng(semilla)
+    años = aleatorio.integers(2018, 2027, filas)
+    edades = aleatorio.choice(['5', ' 43 ', '130', 'abc', '', '67', '0'], filas)
+    municipios = {'ANTIOQUIA': ['MEDELLIN', 'LA UNION'], 'CUNDINAMARCA': ['SOACHA', 'LA UNION'], 'VALLE': ['CALI']}
+    departamentos = aleatorio.choice(list(municipios), filas)
+    
+    registros = []
+    for posicion in range(filas):
+        departamento = departamentos[posicion]
+        registro = {
+            'periodo': f"{años[posicion]}-{aleatorio.integers(1, 13):02d}",
+            'a_o': str(años[posicion]),
+            'sexo': str(aleatorio.choice(['M', 'F', ' F', 'X'])),
+            'edad': str(edades[posicion]),
+            'tipo_edad': str(aleatorio.choice(['AÑOS', 'MESES'])),
+            'procedencia': str(aleatorio.choice(municipios[departamento])),
+            'departamento': f" {departamento} ",
+            'fecha_atencion': str(aleatorio.choice([
+                f"{años[posicion]}-{aleatorio.integers(1, 13):02d}-{aleatorio.integers(1, 29):02d}T00:00:00.000",
+                f"{aleatorio.integers(1, 29):02d}/{aleatorio.integers(1, 13):02d}/{años[posicion]}",
+                'sin fecha'
+            ], p=[0.9, 0.05, 0.05])),
+            'diagnostico': str(aleatorio.choice(['R10', 'S01', 'M54', ''])),
+            'nombre_diagnostico': str(aleatorio.choice(['DOLOR  ABDOMINAL!!', 'HERIDA (CABEZA)', ' LUMBAGO ', 'TRAUMA'])),
+            'regimen': str(aleatorio.choice(['CONTRIBUTIVO', 'SUBSIDIADO'])),
+            'eapb': str(aleatorio.choice(['EPS SURA', 'NUEVA EPS', 'ARS X'])),
+        }
+        if aleatorio.random() < 0.02:
+            del registro['eapb']
+        registros.append(registro)
+    
+    return registros
+
+def ejecutar_motor(motor, registros, hashes_existentes):
+    """Limpiar y detectar nuevos con un motor; retorna (limpios, nuevos, rechazos, segundos)"""
+    config = cargar_configuracion()
+    config.set('Cleaning', 'backend', motor)
+    config.set('Cleaning', 'normalization_cache_file', '')
+    actualizador = ActualizadorMorbilidad(config)
+    
+    inicio = time.perf_counter()
+    limpios = actualizador.limpiar_datos(registros)
+    nuevos = actualizador.identificar_datos_nuevos(limpios, hashes_existentes)
+    segundos = time.perf_counter() - inicio
+    
+    return limpios.reset_index(drop=True), nuevos.reset_index(drop=True), actualizador.rechazos, segundos
+
+def main():
+    parser = argparse.ArgumentParser(description="Paridad y rendimiento de los motores de limpieza")
+    parser.add_argument('--filas', type=int, default=200000, help="Registros sintéticos a procesar")
+    args = parser.parse_args()
+    
+    if pl is None:
+        print("❌ Polars no está instalado (pip install polars pyarrow)")
+        sys.exit(1)
+    
+    registros = generar_registros(args.filas)
+    print(f"📊 Registros: {len(registros)}")
+    
+    # La mitad de los hashes válidos ya "existen" en la base de datos
+    def indice_vacio():
+        return IndicePorPeriodo(lambda periodos: {periodo: IndiceHuellas() for periodo in periodos})
+    
+    limpios, _, _, _ = ejecutar_motor('pandas', registros, indice_vacio())
+    mitad = limpios.iloc[::2]
+    hashes_existentes = indice_vacio()
+    hashes_existentes.agregar(clave_periodo(mitad), mitad['hash_alto'], mitad['hash_bajo'])
+    
+    resultados = {motor: ejecutar_motor(motor, registros, hashes_existentes) for motor in ('pandas', 'polars')}
+    for motor, (limpios, nuevos, _, segundos) in resultados.items():
+        print(f"⏱️  {motor:<7} {segundos:.2f} s - {len(limpios)} válidos, {len(nuevos)} nuevos")
+    
+    esperado, obtenido = resultados['pandas'], resultados['polars']
+    try:
+        pd.testing.assert_frame_equal(esperado[0], obtenido[0])
+        pd.testing.assert_frame_equal(esperado[1], obtenido[1])
+        assert esperado[2] == obtenido[2], f"Rechazos distintos: {esperado[2]} != {obtenido[2]}"
+    except AssertionError as e:
+        print(f"❌ Los motores no coinciden: {e}")
+        sys.exit(1)
+    
+    print(f"✅ Resultados idénticos. Rechazos por regla: {esperado[2]}")
+
+if __name__ == "__main__":
+    main()